@@ -3,9 +3,16 @@ from . import room_simulators
 from . import noise_generators
 
 from .audio import *
+from .resampling import *
+from .headers import *
+from .precision import *
+from .pipeline import *
+from .pack import *
+from .shards import *
 from .array import *
 from .argproc import *
 from .path import *
 from .signals import *
+from .conv import *
 from .cast import *
 
@@ -14,6 +14,12 @@ def create_AudioMixerArray(file):
     print('BUILDING AN ARRAY OF AUDIO MIXERS FROM {}'.format(file))
     print('', flush=True)
 
+    # floating-point precision of the mixing pipeline
+    if 'precision' in mixer_array_configs:
+        libaueffect.set_float_dtype(mixer_array_configs['precision'])
+        print('Floating-point precision: {}'.format(libaueffect.get_float_dtype()))
+        print('', flush=True)
+
     # Make the prior probabilities sum to one. 
     priors = np.array([float(x) for x in mixer_array_configs['probabilities']])
     priors = priors / np.sum(priors)
@@ -37,3 +43,20 @@ def create_AudioMixerArray(file):
 
 
     return mixers, priors        
+
+
+
+# Look up a generator entry of a config file, by its id if given, otherwise the first one whose class name ends with 
+# classname. 
+def find_generator(file, classname, generator_id=None):
+    with open(file) as f:
+        mixer_array_configs = json.load(f)
+
+    for generator_info in mixer_array_configs.get('generators', []):
+        if generator_id is None:
+            if generator_info['generator'].endswith(classname):
+                return generator_info
+        elif generator_info['id'] == generator_id:
+            return generator_info
+
+    raise ValueError('{} not found in {}.'.format(generator_id or classname, file))
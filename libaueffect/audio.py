@@ -1,22 +1,79 @@
 # -*- coding: utf-8 -*-
 import numpy as np
-import scipy.io.wavfile
 from collections import defaultdict
 
-import os, math, struct, sys, warnings, copy, re
+import io, os, math, struct, sys, warnings, re
 
-import wave, audioop, resampy
+from .resampling import resample, get_resample_cache
+from .headers import get_header_index
 
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
 
 
-def read_wavheader(path):
-    with wave.open(path) as wf:
-        samplerate = wf.getframerate()
-        nchannels = wf.getnchannels()
-        qbyte = wf.getsampwidth()
-        nsamples = wf.getnframes()
 
-    return nsamples, nchannels, samplerate, qbyte
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+
+def _parse_wavheader(fid):
+    '''Walk the RIFF chunks up to the data chunk.
+
+    Returns (samplerate, nchannels, qbyte, data_offset, nsamples). The file position is left at the beginning of the audio samples.
+    '''
+    riff = fid.read(12)
+    if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+        raise RuntimeError('Not a RIFF/WAVE file.')
+
+    fmt_chunk_received = False
+
+    while True:
+        chunk = fid.read(8)
+        if len(chunk) < 8:
+            raise RuntimeError('Corrupted wav file: data chunk not found.')
+        chunk_id = chunk[:4]
+        chunk_size = struct.unpack('<I', chunk[4:])[0]
+
+        # 'fmt' chunk
+        if chunk_id == b'fmt ':
+            fmt_chunk = fid.read(chunk_size + (chunk_size & 1))
+            if len(fmt_chunk) < 16:
+                raise RuntimeError('Corrupted wav file: fmt chunk is too short.')
+            format_tag, nchannels, samplerate, _, block_align, bit_depth = struct.unpack('<HHIIHH', fmt_chunk[:16])
+            if format_tag == _WAVE_FORMAT_EXTENSIBLE and len(fmt_chunk) >= 26:
+                format_tag = struct.unpack('<H', fmt_chunk[24:26])[0]
+
+            if format_tag != _WAVE_FORMAT_PCM:
+                raise NotImplementedError('Unsupported format: only PCM is supported.')
+            qbyte = (bit_depth + 7) // 8
+            if qbyte not in (1, 2, 3, 4):
+                raise NotImplementedError('Unsupported bit depth: the wav file has {}-bit data.'.format(bit_depth))
+            fmt_chunk_received = True
+
+        # 'data' chunk
+        elif chunk_id == b'data':
+            if not fmt_chunk_received:
+                raise RuntimeError('Corrupted wav file: fmt chunk not found before data chunk.')
+            data_offset = fid.tell()
+
+            # Some writers leave a bogus size in the header, so trust the file size more.
+            file_size = os.fstat(fid.fileno()).st_size
+            data_size = min(chunk_size, file_size - data_offset)
+            return samplerate, nchannels, qbyte, data_offset, data_size // (qbyte * nchannels)
+
+        else:
+            fid.seek(chunk_size + (chunk_size & 1), 1)
+
+
+
+def read_wavheader(path):
+    index = get_header_index()
+    if index is not None:
+        return index.lookup(path)
+    return get_decoder(path).header(path)
 
 
 
@@ -38,85 +95,213 @@ def read_wavheaders(paths):
 
 
 
-def _interpret_wav(x, fs, ch, nb, sample_rate):
-    # Convert the data to a 16-bit sequence.
+def map_wav(path):
+    '''Memory-map the data chunk of a PCM wav file.
+
+    Returns a (nchannels, nsamples) strided view of the raw samples, the sampling rate, and the sample width in bytes. 
+    For 24-bit files, the view has a trailing axis of 3 bytes. Nothing is read from the disk until the view is accessed.
+    '''
+    with open(path, 'rb') as fid:
+        fs, ch, nb, offset, nsamples = _parse_wavheader(fid)
+
     if nb == 1:
-        x = audioop.bias(x, nb, -128)
-    
-    if len(x) % nb != 0:
-        print('length = {}'.format(len(x)), file=sys.stderr)
-        print('width = {}'.format(nb), file=sys.stderr)
-        raise RuntimeError('Not a whole number of frames')       
-    
-    x = audioop.lin2lin(x, nb, 2)
-
-    # Convert the data to a numpy array.
-    scale = 1./float(1 << 15)
-    fmt = '<i{:d}'.format(2)
-    y = scale * np.frombuffer(x, fmt).astype(np.float32)
-
-    y = y.reshape((-1, ch)).T
-    if sample_rate is not None and sample_rate != fs:
-        y = resampy.resample(y, fs, sample_rate)
+        dtype, shape = np.uint8, (nsamples, ch)
+    elif nb == 3:
+        dtype, shape = np.uint8, (nsamples, ch, 3)
+    else:
+        dtype, shape = '<i{:d}'.format(nb), (nsamples, ch)
+
+    if nsamples == 0:
+        x = np.zeros(shape, dtype=dtype)
+    else:
+        x = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+    return np.swapaxes(x, 0, 1), fs, nb
+
+
+
+def _pcm_to_float(x, nb):
+    # Only the samples contained in the (possibly strided) view are touched. 
+    if nb == 1:
+        y = x.astype(np.float32)
+        y -= 128
+    elif nb == 3:
+        y = x[..., 0].astype(np.int32)
+        y |= x[..., 1].astype(np.int32) << 8
+        y |= x[..., 2].view(np.int8).astype(np.int32) << 16
+        y = y.astype(np.float32)
+    else:
+        y = x.astype(np.float32)
+
+    y *= 1. / float(1 << (8 * nb - 1))
     return y
 
 
 
-def read_wav(path, sample_rate=None, channel=None):
-    with wave.open(path) as wf:
-        fs = wf.getframerate()
-        ch = wf.getnchannels()
-        nb = wf.getsampwidth()
+def _read_pcm_segment(x, nb, start, length, channel):
+    stop = x.shape[1] if length is None else min(start + length, x.shape[1])
 
-        # Read the target segment of audio.
-        x = wf.readframes(wf.getnframes())
+    if channel is None:
+        return _pcm_to_float(x[:, start:stop], nb)
 
-        try:
-            y = _interpret_wav(x, fs, ch, nb, sample_rate)
-        except RuntimeError as e:
-            print('filename = {}'.format(path), file=sys.stderr)
-            raise e
+    if channel == 'random':
+        channel = np.random.randint(0, x.shape[0])
+    return _pcm_to_float(x[channel, start:stop], nb)
 
-        if sample_rate is not None:
-            fs = sample_rate
+
+
+class WavDecoder(object):
+    '''Native decoder for PCM wav files based on map_wav.'''
+    extensions = ('.wav',)
+
+    def accepts(self, path):
+        return os.path.splitext(path)[1].lower() in self.extensions
+
+
+    def stat(self, path):
+        return os.stat(path)
+
+
+    def header(self, path):
+        with open(path, 'rb') as fid:
+            samplerate, nchannels, qbyte, _, nsamples = _parse_wavheader(fid)
+        return nsamples, nchannels, samplerate, qbyte
+
+
+    def read(self, path, start=0, length=None, channel=None):
+        x, fs, nb = map_wav(path)
+        return _read_pcm_segment(x, nb, start, length, channel), fs
+
+
+
+class SoundFileDecoder(object):
+    '''Decoder for the formats handled by libsndfile, e.g., FLAC, through the soundfile package.
+
+    Partial reads seek in the compressed stream, so only the requested segment is decoded.
+    '''
+    extensions = ('.flac', '.ogg', '.aif', '.aiff', '.au', '.caf', '.w64', '.rf64')
+
+    _qbytes = {'PCM_S8': 1, 'PCM_U8': 1, 'PCM_16': 2, 'PCM_24': 3, 'PCM_32': 4, 'FLOAT': 4, 'DOUBLE': 8}
+
+    def accepts(self, path):
+        return os.path.splitext(path)[1].lower() in self.extensions
+
+
+    def stat(self, path):
+        return os.stat(path)
+
+
+    def header(self, path):
+        info = soundfile.info(path)
+        return info.frames, info.channels, info.samplerate, self._qbytes.get(info.subtype, 2)
+
+
+    def read(self, path, start=0, length=None, channel=None):
+        with soundfile.SoundFile(path) as f:
+            fs = f.samplerate
+            if start > 0:
+                f.seek(min(start, f.frames))
+            y = f.read(-1 if length is None else length, dtype='float32', always_2d=True).T
 
         if channel is None:
             return y, fs
-        elif channel == 'random':
-            return y[np.random.randint(0, ch)], fs
+
+        if channel == 'random':
+            channel = np.random.randint(0, y.shape[0])
+        return np.ascontiguousarray(y[channel]), fs
+
+
+
+_decoders = []
+
+def register_decoder(decoder):
+    '''Make a decoder available to read_wav, snip_wav and read_wavheader. 
+
+    A decoder provides accepts(path), header(path), read(path, start, length, channel) and stat(path), the last of which 
+    returns os.stat() of the file holding the samples. Decoders registered later take precedence over the earlier ones.
+    '''
+    _decoders.insert(0, decoder)
+
+
+
+def get_decoder(path):
+    for decoder in _decoders:
+        if decoder.accepts(path):
+            return decoder
+    raise RuntimeError('No audio decoder is available for {}'.format(path))
+
+
+
+if soundfile is not None:
+    register_decoder(SoundFileDecoder())
+register_decoder(WavDecoder())
+
+
+
+def _select_channel(y, channel):
+    if channel is None:
+        return y
+    elif channel == 'random':
+        return y[np.random.randint(0, y.shape[0])]
+    else:
+        return y[channel]
+
+
+
+def read_wav(path, sample_rate=None, channel=None):
+    try:
+        decoder = get_decoder(path)
+        cache = get_resample_cache()
+
+        if sample_rate is None or cache is None or decoder.header(path)[2] == sample_rate:
+            y, fs = decoder.read(path, channel=channel)
+            if sample_rate is not None and sample_rate != fs:
+                y = resample(y, fs, sample_rate)
+                fs = sample_rate
+
         else:
-            return y[channel], fs
+            # All channels are resampled and cached so that any later channel request hits the cache. 
+            st = decoder.stat(path)
+            y = cache.load(path, sample_rate, st)
+            if y is None:
+                y, fs = decoder.read(path)
+                y = resample(y, fs, sample_rate)
+                cache.save(path, sample_rate, y, st)
+            y = _select_channel(y, channel)
+            fs = sample_rate
+
+    except RuntimeError as e:
+        print('filename = {}'.format(path), file=sys.stderr)
+        raise e
+
+    return y, fs
 
 
 
 def snip_wav(path, length, start=0, sample_rate=None, channel=None):
-    with wave.open(path) as wf:
-        fs = wf.getframerate()
-        ch = wf.getnchannels()
-        nb = wf.getsampwidth()
+    try:
+        decoder = get_decoder(path)
 
         if sample_rate is None:
             len_to_read = length
             start_idx = start
         else:
+            fs = decoder.header(path)[2]
             len_to_read = math.ceil(length * fs / sample_rate)
             start_idx = start * fs // sample_rate
 
         # Read the target segment of audio.
-        wf.setpos(start_idx)
-        x = wf.readframes(len_to_read)
+        y, fs = decoder.read(path, start_idx, len_to_read, channel)
 
-        y = _interpret_wav(x, fs, ch, nb, sample_rate)
+    except (RuntimeError, OSError) as e:
+        print('filename = {}'.format(path), file=sys.stderr)
+        raise e
 
-        if sample_rate is not None:
-            fs = sample_rate
+    if sample_rate is not None and sample_rate != fs:
+        y = resample(y, fs, sample_rate)
+        fs = sample_rate
 
-        if channel is None:
-            return y[:, :length], fs
-        elif channel == 'random':
-            return y[np.random.randint(0, ch)], fs
-        else:
-            return y[channel, :length], fs
+    return y[..., :length], fs
 
 
 def snip_wavs(paths, length, start=0, sample_rate=None):
@@ -146,100 +331,240 @@ def quantize_wav(x):
 
 
 
-def append_wav(x, path):
-    '''Adapted from scipy.io.wavfile.read()'''
-    x = copy.deepcopy(x)
+def _wav_header(sample_rate, nchannels, nsamples):
+    block_align = 2 * nchannels
+    data_size = block_align * nsamples
+    return (b'RIFF' + struct.pack('<I', 36 + data_size) + b'WAVE' + 
+            b'fmt ' + struct.pack('<IHHIIHH', 16, _WAVE_FORMAT_PCM, nchannels, sample_rate, sample_rate * block_align, block_align, 16) + 
+            b'data' + struct.pack('<I', data_size))
 
-    x = quantize_wav(x)
-    if x.ndim > 1:
-        x = x.T
 
-    fid = open(path, 'r+b')
 
-    try:
-        file_size, is_big_endian = scipy.io.wavfile._read_riff_chunk(fid)
-        fmt_chunk_received = False
-        data_chunk_received = False
-
-        if is_big_endian:
-            raise NotImplementedError('RIFX is not supported.')
-
-        while fid.tell() < file_size and not data_chunk_received:
-            # read the next chunk
-            chunk_id = fid.read(4)
-
-            # 'fmt' chunk
-            if chunk_id == b'fmt ':
-                fmt_chunk_received = True
-                fmt_chunk = scipy.io.wavfile._read_fmt_chunk(fid, is_big_endian)
-                format_tag, channels, fs = fmt_chunk[1:4]
-                bit_depth = fmt_chunk[6]
-
-                if format_tag != 0x0001:
-                    raise NotImplementedError('Unsupported format: only PCM is supported.')
-                if bit_depth not in (8, 16, 32, 64, 96, 128):
-                    raise NotImplementedError("Unsupported bit depth: the wav file has {}-bit data.".format(bit_depth))
-
-            # 'data' chunk
-            elif chunk_id == b'data':
-                if not fmt_chunk_received:
-                    raise RuntimeError("Corrupted wav file: fmt chunk not found before data chunk.")
-                data_chunk_received = True
-
-                orig_data_size = struct.unpack('<I', fid.read(4))[0]
-                new_data_size = orig_data_size + np.prod(x.shape) * bit_depth // 8;
-
-                fid.seek(-4, 1)
-                fid.write(struct.pack('<I', new_data_size))
-
-                fid.seek(orig_data_size, 1)
-
-                if x.dtype.byteorder == '>' or (x.dtype.byteorder == '=' and sys.byteorder == 'big'):
-                    x = x.byteswap()
-                scipy.io.wavfile._array_tofile(fid, x)
-
-                # Determine file size and place it in correct position at start of the file.
-                size = fid.tell()
-                fid.seek(4, 0)
-                fid.write(struct.pack('<I', size-8))
-
-            elif chunk_id == b'fact':
-                scipy.io.wavfile._skip_unknown_chunk(fid, is_big_endian)
-            elif chunk_id == b'LIST':
-                scipy.io.wavfile._skip_unknown_chunk(fid, is_big_endian)
-            elif chunk_id in (b'JUNK', b'Fake'):
-                scipy.io.wavfile._skip_unknown_chunk(fid, is_big_endian)
-            else:
-                raise RuntimeError('Unknown chunk.')
+def _scratch_dtype(x):
+    # Float samples are scaled in their own precision, as quantize_wav does in place. 
+    return x.dtype if x.dtype.kind == 'f' else np.dtype(np.float64)
+
+
 
-    finally:
-        fid.close()
+def _quantize_block(blk, divisor, buf, qbuf):
+    # Scale, clip and quantize a (samples, channels) block into qbuf with the same arithmetic as dividing by divisor in 
+    # write_wav followed by quantize_wav. buf must be of _scratch_dtype(blk). Returns the number of clipped samples. 
+    int16_max = np.iinfo(np.int16).max
+    int16_min = np.iinfo(np.int16).min
 
+    if divisor != 1:
+        np.divide(blk, np.float64(divisor), out=buf)
+    else:
+        np.copyto(buf, blk)
+    if blk.dtype.kind == 'f':
+        np.multiply(buf, int16_max, out=buf)
+    nclipped = np.count_nonzero(buf > int16_max) + np.count_nonzero(buf < int16_min)
+    np.clip(buf, int16_min, int16_max, out=buf)
+    np.copyto(qbuf, buf, casting='unsafe')
+    return nclipped
+
+
+
+class WavWriter(object):
+    '''Incremental 16-bit PCM wav writer.
+
+    The file is opened once. Each block passed to write() is divided by divisor, scaled, clipped and quantized over a small 
+    scratch buffer, and the RIFF and data chunk sizes are patched when the writer is closed. Float samples are scaled in 
+    their own precision, so the output is bit-exact with quantize_wav. With mode='a', the samples are appended 
+    to an existing 16-bit PCM file whose sampling rate and number of channels are taken from its header. Files with chunks 
+    after the data chunk are refused, since the appended samples would overwrite them. path may also be a seekable binary 
+    file object, in which case the wav file is written from its current position and the file object is left open.
+    '''
+    def __init__(self, path, sample_rate=16000, nchannels=1, divisor=1.0, mode='w', block_size=65536):
+        if mode not in ('w', 'a'):
+            raise ValueError('mode must be either w or a.')
+
+        self._path = path
+        self._divisor = divisor
+        self._block_size = block_size
+        self._nclipped = 0
+        self._owns_fid = not hasattr(path, 'write')
+
+        if not self._owns_fid and mode != 'w':
+            raise ValueError('File objects can only be written in mode w.')
+
+        if mode == 'w':
+            self._fid = open(path, 'wb') if self._owns_fid else path
+            self._start = self._fid.tell()
+            self._sample_rate = sample_rate
+            self._nchannels = nchannels
+            self._nsamples = 0
+            self._write_header()
+        else:
+            self._fid = open(path, 'r+b')
+            self._start = 0
+            try:
+                self._sample_rate, self._nchannels, qbyte, data_offset, self._nsamples = _parse_wavheader(self._fid)
+                if qbyte != 2:
+                    raise NotImplementedError('Only 16-bit wav files can be appended to.')
 
+                # Appending overwrites whatever follows the samples, so chunks after the data chunk (e.g., LIST) would be lost. 
+                if data_offset + 2 * self._nchannels * self._nsamples < os.fstat(self._fid.fileno()).st_size:
+                    raise NotImplementedError('Cannot append to a wav file with chunks after the data chunk.')
+            except:
+                self._fid.close()
+                raise
+            self._data_offset = data_offset
+            self._fid.seek(data_offset + 2 * self._nchannels * self._nsamples)
+
+        self._buf = np.empty((block_size, self._nchannels), dtype=np.float64)
+        self._qbuf = np.empty((block_size, self._nchannels), dtype='<i2')
+
+
+
+    def _write_header(self):
+        self._fid.write(_wav_header(self._sample_rate, self._nchannels, 0))
+        self._data_offset = self._fid.tell()
+
+
+
+    def write(self, x):
+        x = np.asarray(x)
+        if x.ndim == 1:
+            x = x[np.newaxis]
+        if x.shape[0] != self._nchannels:
+            raise ValueError('Expected {} channels, got {}.'.format(self._nchannels, x.shape[0]))
+
+        if self._buf.dtype != _scratch_dtype(x):
+            self._buf = np.empty(self._qbuf.shape, dtype=_scratch_dtype(x))
+
+        for i in range(0, x.shape[1], self._block_size):
+            blk = x[:, i : i + self._block_size].T
+            qbuf = self._qbuf[:blk.shape[0]]
+            self._nclipped += _quantize_block(blk, self._divisor, self._buf[:blk.shape[0]], qbuf)
+
+            self._fid.write(memoryview(qbuf).cast('B'))
+            self._nsamples += blk.shape[0]
+
+
+
+    def close(self):
+        if self._fid is None:
+            return
+
+        try:
+            data_size = 2 * self._nchannels * self._nsamples
+            self._fid.seek(self._data_offset + data_size)
+            self._fid.truncate()
+
+            self._fid.seek(self._start + 4)
+            self._fid.write(struct.pack('<I', self._data_offset - self._start + data_size - 8))
+            self._fid.seek(self._data_offset - 4)
+            self._fid.write(struct.pack('<I', data_size))
+            self._fid.seek(self._data_offset + data_size)
+        finally:
+            if self._owns_fid:
+                self._fid.close()
+            self._fid = None
+
+        if self._nclipped > 0:
+            warnings.warn('Clipping {} samples'.format(self._nclipped))
+
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-def write_wav(x, path, sample_rate=16000, avoid_clipping=False, save_as_one_file=True):
-    x = copy.deepcopy(x)
 
+
+def append_wav(x, path):
+    with WavWriter(path, mode='a') as writer:
+        writer.write(x)
+
+
+
+def _clipping_divisor(x, avoid_clipping):
+    # The divisor is computed in float64 exactly as write_wav always did. 
+    divisor = 1.0
     if avoid_clipping:
         m = np.max(np.abs(x))
         if m > np.iinfo(np.int16).max / np.abs(np.iinfo(np.int16).min):
-            x /= ( m * np.abs(np.iinfo(np.int16).min) / np.iinfo(np.int16).max )
+            divisor = m * np.abs(np.iinfo(np.int16).min) / np.iinfo(np.int16).max
+    return divisor
+
+
+
+class WavStream(io.RawIOBase):
+    '''Read-only file object producing the 16-bit wav file that write_wav would write for x. 
+
+    The samples are quantized block by block as they are read, so the file is never held in memory as a whole. Its length 
+    in bytes is known in advance and given by size. Wrap it in io.BufferedReader when exact-size reads are needed. 
+    '''
+    def __init__(self, x, sample_rate=16000, avoid_clipping=False, block_size=65536):
+        x = np.asarray(x)
+        self._x = x[np.newaxis] if x.ndim == 1 else x
+        self._divisor = _clipping_divisor(x, avoid_clipping)
+        self._block_size = block_size
+        self._pos = 0
+        self._nclipped = 0
 
-    x = quantize_wav(x)
-    if x.ndim > 1:
-        x = x.T
+        self._pending = memoryview(_wav_header(sample_rate, self._x.shape[0], self._x.shape[1]))
+        self.size = len(self._pending) + 2 * self._x.shape[0] * self._x.shape[1]
+
+        self._buf = np.empty((min(block_size, self._x.shape[1]), self._x.shape[0]), dtype=_scratch_dtype(x))
+        self._qbuf = np.empty(self._buf.shape, dtype='<i2')
+
+
+
+    def readable(self):
+        return True
+
+
+
+    def readinto(self, b):
+        if len(self._pending) == 0:
+            if self._pos >= self._x.shape[1]:
+                return 0
+
+            blk = self._x[:, self._pos : self._pos + self._block_size].T
+            qbuf = self._qbuf[:blk.shape[0]]
+            self._nclipped += _quantize_block(blk, self._divisor, self._buf[:blk.shape[0]], qbuf)
+            self._pending = memoryview(qbuf).cast('B')
+            self._pos += blk.shape[0]
+
+            if self._pos >= self._x.shape[1] and self._nclipped > 0:
+                warnings.warn('Clipping {} samples'.format(self._nclipped))
+
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+
+def encode_wav(x, sample_rate=16000, avoid_clipping=False):
+    # Return the bytes of the 16-bit wav file that write_wav would write for x. 
+    fid = io.BytesIO()
+    nchannels = 1 if x.ndim == 1 else x.shape[0]
+    with WavWriter(fid, sample_rate=sample_rate, nchannels=nchannels, divisor=_clipping_divisor(x, avoid_clipping)) as writer:
+        writer.write(x)
+    return fid.getvalue()
+
+
+
+def write_wav(x, path, sample_rate=16000, avoid_clipping=False, save_as_one_file=True):
+    divisor = _clipping_divisor(x, avoid_clipping)
 
     os.makedirs(os.path.dirname(path), exist_ok=True)
 
     if save_as_one_file or x.ndim == 1:
-        scipy.io.wavfile.write(path, sample_rate, x)
+        nchannels = 1 if x.ndim == 1 else x.shape[0]
+        with WavWriter(path, sample_rate=sample_rate, nchannels=nchannels, divisor=divisor) as writer:
+            writer.write(x)
     else:        
-        nmics = x.shape[1]
-        for i in range(nmics):
-            basename = path[:-4] if path[-4:] == '.wav' else path
-            fname = f'{basename}__{i}.wav'
-            scipy.io.wavfile.write(fname, sample_rate, x[:, i])
-
+        basename = path[:-4] if path[-4:] == '.wav' else path
+        for i in range(x.shape[0]):
+            with WavWriter(f'{basename}__{i}.wav', sample_rate=sample_rate, nchannels=1, divisor=divisor) as writer:
+                writer.write(x[i])
 
 
 def load_rir_collection(rirlist, filename_style='haerdoga'):
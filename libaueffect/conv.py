@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import scipy.signal
+import scipy.fft
+
+
+
+# Filters with up to this many taps are applied directly with lfilter, which is faster than the FFT for such short filters. 
+DIRECT_CONV_MAX_TAPS = 64
+
+
+
+class FirFilter(object):
+    '''A multi-channel FIR filter, e.g., an RIR, that is applied to many signals. 
+
+    Long filters are applied by FFT-based overlap-add convolution of all the channels at once. The filter spectra are computed 
+    once for each FFT size and reused for every signal the filter is applied to. The output is the same as that of 
+    scipy.signal.lfilter(h[..., j], 1, x), i.e., the convolution truncated to the length of x, up to rounding errors. 
+
+    Args:
+        h: filter coefficients of shape (taps,) or (..., taps)
+        method: direct, fft or auto, which uses direct convolution for filters of up to DIRECT_CONV_MAX_TAPS taps and 
+        fft otherwise
+    '''
+    def __init__(self, h, method='auto'):
+        self._h = np.asarray(h)
+        self._ntaps = self._h.shape[-1]
+
+        if method == 'auto':
+            method = 'direct' if self._ntaps <= DIRECT_CONV_MAX_TAPS else 'fft'
+        if method not in ('direct', 'fft'):
+            raise ValueError('method must be auto, direct or fft: {}'.format(method))
+        self._method = method
+
+        # The FFT size for long signals. A block advances by nfft - taps + 1 samples, which is at least 7/8 of the FFT size. 
+        self._max_fft_size = scipy.fft.next_fast_len(8 * self._ntaps)
+        self._spectra = {}
+
+
+
+    @property
+    def ntaps(self):
+        return self._ntaps
+
+
+
+    def _spectrum(self, nfft):
+        if nfft not in self._spectra:
+            self._spectra[nfft] = scipy.fft.rfft(self._h, n=nfft, axis=-1)
+        return self._spectra[nfft]
+
+
+
+    def __call__(self, x):
+        '''Filter signal x of shape (samples,). The output has a shape of (samples,) or (..., samples).'''
+        x = np.asarray(x)
+        nsamples = x.shape[-1]
+        dtype = np.result_type(self._h, x)
+        if nsamples == 0:
+            return np.zeros(self._h.shape[:-1] + (0,), dtype=dtype)
+
+        if self._method == 'direct':
+            y = np.empty(self._h.shape[:-1] + (nsamples,), dtype=dtype)
+            for idx in np.ndindex(self._h.shape[:-1]):
+                y[idx] = scipy.signal.lfilter(self._h[idx], 1, x)
+            return y
+
+        # A short signal is processed as a single block, which limits the number of FFT sizes to cache. 
+        nfft = min(self._max_fft_size, scipy.fft.next_fast_len(nsamples + self._ntaps - 1))
+        block = nfft - self._ntaps + 1
+        nblocks = -(-nsamples // block)
+
+        # Transform all the blocks of x, multiply them with the filter spectra, and transform them back. 
+        xb = np.zeros(nblocks * block, dtype=x.dtype)
+        xb[:nsamples] = x
+        X = scipy.fft.rfft(xb.reshape((nblocks, block)), n=nfft, axis=-1)
+        H = self._spectrum(nfft)
+        yb = scipy.fft.irfft(H[..., np.newaxis, :] * X, n=nfft, axis=-1)
+
+        if nblocks == 1:
+            return yb[..., 0, :nsamples].astype(dtype, copy=False)
+
+        # Overlap-add. With the largest FFT size, the tail of each block is not longer than a block, so it only overlaps with 
+        # the next block. 
+        y = np.zeros(self._h.shape[:-1] + (nblocks + 1, block), dtype=yb.dtype)
+        y[..., :nblocks, :] = yb[..., :block]
+        y[..., 1:, :nfft - block] += yb[..., block:]
+        y = y.reshape(self._h.shape[:-1] + ((nblocks + 1) * block,))
+
+        return y[..., :nsamples].astype(dtype, copy=False)
+
+
+
+def fir_filter(h, x, method='auto'):
+    '''Filter a signal with one or more FIR filters, e.g., the channels of an RIR. 
+
+    The output is the same as that of scipy.signal.lfilter(h[..., j], 1, x), i.e., the convolution truncated to the length of 
+    x. See FirFilter for details. Use FirFilter directly to apply the same filter to many signals. 
+    '''
+    # Taps beyond the signal length do not affect the truncated output. 
+    h = np.asarray(h)[..., :np.shape(x)[-1]]
+    return FirFilter(h, method=method)(x)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import os, sqlite3, threading, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+
+class HeaderIndex(object):
+    '''Persistent table of audio file headers stored in an sqlite3 database.
+
+    Each entry holds (nsamples, nchannels, samplerate, qbyte) of one file and is keyed by the path together with the size 
+    and the modification time of the file, so entries of modified files are refreshed automatically. update() fills the 
+    table in parallel; lookup() serves a single file and inserts it if needed.
+
+    The lock only serializes the threads of one process, and sqlite file locking is unreliable on NFS. Parallel jobs should 
+    therefore open an index filled beforehand with readonly=True. A read-only index is opened without any locking, never 
+    written, and files missing from it are read directly. 
+    '''
+    def __init__(self, dbfile, readonly=False):
+        self._dbfile = os.path.abspath(dbfile)
+        self._readonly = readonly
+        self._lock = threading.Lock()
+
+        if self._readonly:
+            uri = 'file:{}?mode=ro&immutable=1'.format(urllib.request.pathname2url(self._dbfile))
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            return
+
+        os.makedirs(os.path.dirname(self._dbfile), exist_ok=True)
+        self._conn = sqlite3.connect(self._dbfile, timeout=600, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS headers '
+                               '(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+                               'nsamples INTEGER, nchannels INTEGER, samplerate INTEGER, qbyte INTEGER)')
+
+
+
+    def _put(self, entries):
+        if self._readonly:
+            return
+        rows = [(path, st.st_size, st.st_mtime_ns) + tuple(header) for path, st, header in entries]
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO headers VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+
+
+    def lookup(self, path):
+        from .audio import get_decoder
+        decoder = get_decoder(path)
+        st = decoder.stat(path)
+
+        with self._lock:
+            row = self._conn.execute('SELECT size, mtime_ns, nsamples, nchannels, samplerate, qbyte FROM headers WHERE path = ?', 
+                                     (path,)).fetchone()
+        if row is not None and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return tuple(row[2:])
+
+        header = decoder.header(path)
+        self._put([(path, st, header)])
+        return header
+
+
+
+    def update(self, paths, nj=1):
+        '''Make sure that the given files have valid entries. Returns the number of headers that had to be read.'''
+        from .audio import get_decoder
+
+        def _stat(path):
+            return path, get_decoder(path).stat(path)
+
+        def _read(item):
+            path, st = item
+            return path, st, get_decoder(path).header(path)
+
+        with self._lock:
+            known = {row[0]: (row[1], row[2]) for row in self._conn.execute('SELECT path, size, mtime_ns FROM headers')}
+
+        with ThreadPoolExecutor(max_workers=nj) as executor:
+            stats = list(executor.map(_stat, paths))
+            stale = [(path, st) for path, st in stats if known.get(path) != (st.st_size, st.st_mtime_ns)]
+            entries = list(executor.map(_read, stale))
+
+        self._put(entries)
+        return len(entries)
+
+
+
+_header_index = None
+
+def set_header_index(dbfile, readonly=False):
+    '''Route read_wavheader (and read_wavheaders) through a persistent header index. None disables the index.'''
+    global _header_index
+    _header_index = None if dbfile is None else HeaderIndex(dbfile, readonly=readonly)
+    return _header_index
+
+
+
+def get_header_index():
+    return _header_index
@@ -1,2 +1,3 @@
 from .rmix import *
 from .cmix import *
+from .rmix_streaming import *
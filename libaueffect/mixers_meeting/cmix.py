@@ -26,7 +26,7 @@ class CleanMixMeeting(object):
     def __call__(self, inputs, offsets, speaker_labels, to_return=()):
         ylen = np.amax([len(dt) + offset for dt, offset in zip(inputs, offsets)])
 
-        y = np.zeros(ylen)
+        y = np.zeros(ylen, dtype=libaueffect.get_float_dtype())
         for dt, offset in zip(inputs, offsets):
             gain = np.random.uniform(self._gain_range[0], self._gain_range[1])
             scale = 10**(gain / 20)
@@ -7,7 +7,7 @@ import numpy as np
 
 
 class ReverbMixMeeting(object):
-    def __init__(self, room_simulator, noise_generator=None, gain_range=[-5, 5], min_snr=0.0, max_snr=20.0):
+    def __init__(self, room_simulator, noise_generator=None, gain_range=[-5, 5], min_snr=0.0, max_snr=20.0, convolve_per_speaker=False):
         self._room_simulator = room_simulator
         self._noise_generator = noise_generator
 
@@ -15,9 +15,14 @@ class ReverbMixMeeting(object):
         self._min_snr = libaueffect.checked_cast(min_snr, 'float')
         self._max_snr = libaueffect.checked_cast(max_snr, 'float')
 
+        # If true, the utterances of each speaker are scaled and summed before being reverberated at once. Then the 
+        # reverberation tail of each utterance is not cut off at its end but rings into the following signal. 
+        self._convolve_per_speaker = libaueffect.checked_cast(convolve_per_speaker, 'bool')
+
         print('Instantiating ReverbMixMeeting')
         print('Gain range in dB: ({}, {})'.format(self._gain_range[0], self._gain_range[1]))
         print('SNR range in dB: ({}, {})'.format(self._min_snr, self._max_snr))
+        print('Convolution per speaker: {}'.format(self._convolve_per_speaker))
         print('', flush=True)
 
 
@@ -42,32 +47,54 @@ class ReverbMixMeeting(object):
         nspkrs = len(spkrs)
 
         # Generate RIRs. 
-        rir, rir_info = self._room_simulator(nspeakers=nspkrs, info_as_display_style=True)
+        rir, rir_info = self._room_simulator(nspeakers=nspkrs, info_as_display_style=True, remove_delay=True)
 
         spkr2idx = {spkr: i for i, spkr in enumerate(spkrs)}
         rir_info.append( ('speakers', spkrs) )
 
-        # Remove the preceding delay. 
-        rir = libaueffect.remove_delay_from_rirs(rir)
+        # The preceding delay has been removed by the room simulator. 
+        rir = [libaueffect.as_float(h) for h in rir]
         nchans = rir[0].shape[0]
 
-        # Reverberate each segment. 
-        z = []
-        for x, spkr in zip(inputs, speaker_labels):
-            h = rir[ spkr2idx[spkr] ]            
-            z.append( np.stack([scipy.signal.lfilter(h[j], 1, x) for j in range(nchans)]) )
-
-        # Generate the mixture signals. 
-        target_len = np.amax([dt.shape[1] + offset for dt, offset in zip(z, offsets)])
+        dtype = libaueffect.get_float_dtype()
+        inputs = [libaueffect.as_float(x) for x in inputs]
 
-        s = np.zeros((nspkrs, target_len))  # anechoic signals
-        u = np.zeros((nspkrs, nchans, target_len))  # source images
+        # The RIR spectra of each speaker are computed once and reused for all the speaker's utterances. 
+        filters = [libaueffect.FirFilter(h) for h in rir]
 
-        for dt, x, offset, spkr in zip(z, inputs, offsets, speaker_labels):
+        # Generate the mixture signals. 
+        target_len = np.amax([x.shape[0] + offset for x, offset in zip(inputs, offsets)])
+
+        # The anechoic signals and source images are only kept when they are needed. Otherwise, the reverberated segments are 
+        # added directly to the mixture. 
+        s = None
+        if 'source' in to_return or self._convolve_per_speaker:
+            s = np.zeros((nspkrs, target_len), dtype=dtype)  # anechoic signals
+        u = None
+        if 'image' in to_return:
+            u = np.zeros((nspkrs, nchans, target_len), dtype=dtype)  # source images
+        y = np.zeros((nchans, target_len), dtype=dtype)
+
+        for x, offset, spkr in zip(inputs, offsets, speaker_labels):
             gain = np.random.uniform(self._gain_range[0], self._gain_range[1])
             gain = 10**(gain / 20)
-            s[spkr2idx[spkr], offset : offset + x.shape[0]] += x * gain
-            u[spkr2idx[spkr], :, offset : offset + dt.shape[1]] += gain * dt
+            if s is not None:
+                s[spkr2idx[spkr], offset : offset + x.shape[0]] += x * gain
+
+            # Reverberate each segment. 
+            if not self._convolve_per_speaker:
+                image = gain * filters[spkr2idx[spkr]](x)
+                if u is None:
+                    y[:, offset : offset + x.shape[0]] += image
+                else:
+                    u[spkr2idx[spkr], :, offset : offset + x.shape[0]] += image
+
+        if self._convolve_per_speaker:
+            for i in range(nspkrs):
+                if u is None:
+                    y += filters[i](s[i])
+                else:
+                    u[i] = filters[i](s[i])
 
         # # Time-shift and concatenate the utterances of each speaker. 
         # target_len = np.amax([dt.shape[1] + offset for dt, offset in zip(z, offsets)])
@@ -87,24 +114,26 @@ class ReverbMixMeeting(object):
         #     for j in range(nchans):
         #         u[spkr_idx, j] = scipy.signal.lfilter(h[j], 1, s[spkr_idx])
 
-        y = np.sum(u, axis=0)
+        if u is not None:
+            y = np.sum(u, axis=0)
 
         # Generate noise. 
         if self._noise_generator is not None:
-            n = self._noise_generator(nsamples=target_len)                                                                                                                                                       
+            n = libaueffect.as_float(self._noise_generator(nsamples=target_len))                                                                                                                                                       
             n, snr = libaueffect.signals.scale_noise_to_random_snr(n, y, self._min_snr, self._max_snr)
 
             # Add the noise and normalize the resultant signal. 
             y += n
         else:
-            n = np.zeros((nchans, target_len))
+            n = np.zeros((nchans, target_len), dtype=dtype)
 
         # Normalize the generated signal. 
         max_amplitude = np.amax(np.absolute(y))
         scale = (32767/32768) / max_amplitude * 0.3
         y *= scale
         n *= scale
-        u *= scale
+        if u is not None:
+            u *= scale
         for h in rir:
             h *= scale
 
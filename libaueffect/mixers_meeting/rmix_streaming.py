@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+import libaueffect
+
+import tempfile
+from collections import OrderedDict
+import numpy as np
+import scipy.fft
+
+from .rmix import ReverbMixMeeting
+
+
+
+class StreamingReverbMixMeeting(ReverbMixMeeting):
+    '''ReverbMixMeeting for long meetings with bounded memory usage. 
+
+    The session timeline is rendered in fixed-size blocks by uniformly partitioned convolution, where only the utterances 
+    active in each block are convolved. The mixture, noise and requested intermediate signals are kept in memory-mapped 
+    temporary files and returned as memmaps, which the wav writers read block by block. The noise is also generated block 
+    by block if the noise generator provides generate_blocks(nsamples, block_size). 
+
+    As with ReverbMixMeeting, the reverberated signal of each utterance is truncated at the end of the utterance. Without a 
+    noise generator, the output equals that of ReverbMixMeeting up to rounding errors. When the noise generator provides 
+    generate_blocks, the noise comes from a different random sequence than a single call would give. The noise, the SNR 
+    drawn after it and the final scaling then differ, so only the reverberated speech matches, up to a gain. 
+    '''
+    def __init__(self, room_simulator, noise_generator=None, gain_range=[-5, 5], min_snr=0.0, max_snr=20.0, 
+                 block_size=4096, tmpdir=None):
+        super().__init__(room_simulator, noise_generator=noise_generator, gain_range=gain_range, min_snr=min_snr, max_snr=max_snr)
+
+        self._block_size = libaueffect.checked_cast(block_size, 'int')
+        self._tmpdir = tmpdir
+
+        print('Block size: {}'.format(self._block_size))
+        print('Directory for temporary files: {}'.format(self._tmpdir))
+        print('', flush=True)
+
+
+
+    def _allocate(self, shape):
+        # The file is deleted as soon as the memmap is released. 
+        with tempfile.TemporaryFile(dir=self._tmpdir) as f:
+            return np.memmap(f, dtype=libaueffect.get_float_dtype(), mode='w+', shape=shape)
+
+
+
+    def _partition_rir(self, h):
+        # Split the RIR into partitions of the block size and transform each of them zero-padded to twice the block size. 
+        B = self._block_size
+        nparts = -(-h.shape[1] // B)
+        hp = np.zeros((h.shape[0], nparts * B), dtype=h.dtype)
+        hp[:, :h.shape[1]] = h
+        hp = hp.reshape((h.shape[0], nparts, B)).transpose((1, 0, 2))
+        return scipy.fft.rfft(hp, n=2 * B, axis=-1)  # partitions x channels x bins
+
+
+
+    def _noise_blocks(self, nsamples):
+        if hasattr(self._noise_generator, 'generate_blocks'):
+            for n in self._noise_generator.generate_blocks(nsamples, self._block_size):
+                yield libaueffect.as_float(n)
+        else:
+            n = libaueffect.as_float(self._noise_generator(nsamples=nsamples))
+            for t in range(0, nsamples, self._block_size):
+                yield n[:, t : t + self._block_size]
+
+
+
+    def __call__(self, inputs, offsets, speaker_labels, to_return=('image', 'noise')):
+        B = self._block_size
+
+        # Determine the number of speakers. 
+        spkrs = sorted(list(set(speaker_labels)))
+        nspkrs = len(spkrs)
+
+        # Generate RIRs. 
+        rir, rir_info = self._room_simulator(nspeakers=nspkrs, info_as_display_style=True, remove_delay=True)
+
+        spkr2idx = {spkr: i for i, spkr in enumerate(spkrs)}
+        rir_info.append( ('speakers', spkrs) )
+
+        rir = [libaueffect.as_float(h) for h in rir]
+        nchans = rir[0].shape[0]
+        H = [self._partition_rir(h) for h in rir]
+
+        inputs = [libaueffect.as_float(x) for x in inputs]
+        gains = [10**(np.random.uniform(self._gain_range[0], self._gain_range[1]) / 20) for x in inputs]
+
+        target_len = np.amax([x.shape[0] + offset for x, offset in zip(inputs, offsets)])
+        nblocks = -(-target_len // B)
+
+        y = self._allocate((nchans, target_len))
+        u = self._allocate((nspkrs, nchans, target_len)) if 'image' in to_return else None
+        s = self._allocate((nspkrs, target_len)) if 'source' in to_return else None
+
+        # Frequency-domain delay line of each utterance, which holds the spectra of its latest input blocks. 
+        utts = []
+        for x, offset, spkr, gain in zip(inputs, offsets, speaker_labels, gains):
+            utts.append({'x': x, 'offset': offset, 'end': offset + x.shape[0], 'spkr': spkr2idx[spkr], 'gain': gain,
+                         'first': offset // B, 'last': (offset + x.shape[0] - 1) // B,
+                         'fdl': None, 'prev': np.zeros(B, dtype=x.dtype)})
+
+        noise_blocks = None if self._noise_generator is None else self._noise_blocks(target_len)
+        n = None if noise_blocks is None else self._allocate((nchans, target_len))
+        sum_y = 0
+        sum_n = 0
+
+        for k in range(nblocks):
+            t0 = k * B
+            t1 = min(t0 + B, target_len)
+
+            # Spectra of the image blocks covered entirely by their utterances are summed before the inverse transform. 
+            Yfull = [None] * nspkrs
+            yb = np.zeros((nspkrs, nchans, B), dtype=y.dtype)
+
+            for utt in utts:
+                if not utt['first'] <= k <= utt['last']:
+                    continue
+
+                # Place the scaled utterance samples falling into this block. 
+                xb = np.zeros(B, dtype=utt['x'].dtype)
+                start = max(t0, utt['offset'])
+                end = min(t0 + B, utt['end'])
+                xb[start - t0 : end - t0] = utt['gain'] * utt['x'][start - utt['offset'] : end - utt['offset']]
+                if s is not None:
+                    s[utt['spkr'], start : end] += xb[start - t0 : end - t0]
+
+                # Overlap-save: each input spectrum covers the previous and current blocks. 
+                Hs = H[utt['spkr']]
+                if utt['fdl'] is None:
+                    utt['fdl'] = np.zeros((Hs.shape[0], B + 1), dtype=np.result_type(Hs.dtype, xb.dtype))
+                utt['fdl'][k % Hs.shape[0]] = scipy.fft.rfft(np.concatenate([utt['prev'], xb]))
+                utt['prev'] = xb
+
+                order = [(k - p) % Hs.shape[0] for p in range(Hs.shape[0])]
+                Y = np.einsum('pcf,pf->cf', Hs, utt['fdl'][order])
+
+                if start == t0 and end == t0 + B:
+                    Yfull[utt['spkr']] = Y if Yfull[utt['spkr']] is None else Yfull[utt['spkr']] + Y
+                else:
+                    # The image is truncated at the end of the utterance. 
+                    yb[utt['spkr'], :, :end - t0] += scipy.fft.irfft(Y, n=2 * B, axis=-1)[:, B : B + end - t0]
+
+                # Release the delay line once the utterance has ended. 
+                if k == utt['last']:
+                    utt['fdl'] = None
+
+            for i in range(nspkrs):
+                if Yfull[i] is not None:
+                    yb[i] += scipy.fft.irfft(Yfull[i], n=2 * B, axis=-1)[:, B:]
+
+            y[:, t0:t1] = np.sum(yb[:, :, :t1 - t0], axis=0)
+            sum_y += np.sum(np.absolute(y[:, t0:t1]))
+            if u is not None:
+                u[:, :, t0:t1] = yb[:, :, :t1 - t0]
+
+            if noise_blocks is not None:
+                n[:, t0:t1] = next(noise_blocks)
+                sum_n += np.sum(np.absolute(n[:, t0:t1]))
+
+        # Scale the noise to a random SNR and find the peak of the noisy mixture. 
+        if n is not None:
+            snr = np.random.uniform(self._min_snr, self._max_snr)
+            noise_scale = sum_y / sum_n * 10**(-snr / 20)
+        else:
+            noise_scale = 0
+
+        max_amplitude = 0
+        for t0 in range(0, target_len, B):
+            yb = y[:, t0 : t0 + B]
+            if n is not None:
+                yb = yb + noise_scale * n[:, t0 : t0 + B]
+            max_amplitude = max(max_amplitude, np.amax(np.absolute(yb)))
+
+        # Normalize the generated signals. 
+        scale = (32767/32768) / max_amplitude * 0.3
+        for t0 in range(0, target_len, B):
+            if n is not None:
+                n[:, t0 : t0 + B] *= noise_scale
+                y[:, t0 : t0 + B] += n[:, t0 : t0 + B]
+                n[:, t0 : t0 + B] *= scale
+            y[:, t0 : t0 + B] *= scale
+            if u is not None:
+                u[:, :, t0 : t0 + B] *= scale
+        for h in rir:
+            h *= scale
+
+        # description of the mixing process 
+        params = [('mixer', self.__class__.__name__),
+                  ('implementation', __name__)]
+        params += rir_info
+        if n is not None:
+            params.append( ('snr', snr) )
+
+        # intermediate signals 
+        interm = {}
+        for wanted in to_return:
+            if wanted == 'image':
+                interm[wanted] = {f'{wanted}{spkr}': u[spkr2idx[spkr]] for spkr in spkrs}
+
+            elif wanted == 'noise':
+                if n is None:
+                    n = self._allocate((nchans, target_len))
+                interm[wanted] = {wanted: n}
+
+            elif wanted == 'rir':
+                interm[wanted] = {f'{wanted}{spkr}': rir[spkr2idx[spkr]] for spkr in spkrs}
+
+            elif wanted == 'source':
+                interm[wanted] = {f'{wanted}{spkr}': s[spkr2idx[spkr]] for spkr in spkrs}
+
+        return y, OrderedDict(params), interm
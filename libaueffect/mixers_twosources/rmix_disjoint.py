@@ -49,7 +49,7 @@ class ReverbMixDisjointNoise(object):
                 self._noise_generator = generator_pool[id]
 
 
-    def __call__(self, inputs, samplerate, output_filename, input_filenames, to_save=('image', 'noise'), save_as_one_file=False):
+    def __call__(self, inputs, samplerate, output_filename, input_filenames, to_save=('image', 'noise'), save_as_one_file=False, writer=None):
         print(output_filename)
         for i, f in enumerate(input_filenames):
             if i == 0:
@@ -102,8 +102,8 @@ class ReverbMixDisjointNoise(object):
 
         # Filter and mix the signals. 
         target_amp = np.random.uniform(self._min_amplitude, self._max_amplitude)
-        h, h_info = self._room_simulator(nspeakers=2, info_as_display_style=True)
-        z, y, h = libaueffect.reverb_mix(x, h, sample_rate=samplerate, cancel_delay=self._no_delay, second_arg_is_filename=False)
+        h, h_info = self._room_simulator(nspeakers=2, info_as_display_style=True, remove_delay=self._no_delay)
+        z, y, h = libaueffect.reverb_mix(x, h, sample_rate=samplerate, second_arg_is_filename=False)
 
         # Generage noise. 
         if self._noise_generator is not None:
@@ -139,26 +139,29 @@ class ReverbMixDisjointNoise(object):
         if self._noise_generator is not None:
             params.append( ('snr', snr) )
 
+        # Hand the signals over to the writer if one is given. 
+        write_wav = libaueffect.write_wav if writer is None else writer.write_wav
+
         path, ext = os.path.splitext(output_filename)        
 
         # Save the reverberant source signals. 
         if 'image' in to_save:
             for i in range(len(y)):
                 outfile = '{}_s{}{}'.format(path, i, ext)            
-                libaueffect.write_wav(y[i], outfile, sample_rate=samplerate, avoid_clipping=False, save_as_one_file=save_as_one_file)
+                write_wav(y[i], outfile, sample_rate=samplerate, avoid_clipping=False, save_as_one_file=save_as_one_file)
                 params.append(('source{}'.format(i), outfile))
 
         # Save the noise. 
         if 'noise' in to_save and self._noise_generator is not None:
             outfile = '{}_s{}{}'.format(path, len(y), ext)            
-            libaueffect.write_wav(n, outfile, sample_rate=samplerate, avoid_clipping=False, save_as_one_file=save_as_one_file)
+            write_wav(n, outfile, sample_rate=samplerate, avoid_clipping=False, save_as_one_file=save_as_one_file)
             params.append(('noise', outfile))
 
         # Save the RIRs.
         if 'rir' in to_save: 
             for i in range(len(h)):
                 outfile = '{}_r{}{}'.format(path, i, ext)            
-                libaueffect.write_wav(h[i], outfile, sample_rate=samplerate, avoid_clipping=False, save_as_one_file=save_as_one_file)
+                write_wav(h[i], outfile, sample_rate=samplerate, avoid_clipping=False, save_as_one_file=save_as_one_file)
                 params.append(('rir{}'.format(i), outfile))
 
         # Save the anechoic source signals. 
@@ -166,7 +169,7 @@ class ReverbMixDisjointNoise(object):
             path, ext = os.path.splitext(output_filename)        
             for i in range(len(x)):
                 outfile = '{}_a{}{}'.format(path, i, ext)            
-                libaueffect.write_wav(x[i], outfile, sample_rate=samplerate, avoid_clipping=False, save_as_one_file=save_as_one_file)
+                write_wav(x[i], outfile, sample_rate=samplerate, avoid_clipping=False, save_as_one_file=save_as_one_file)
                 params.append(('anechoic{}'.format(i), outfile))
 
         return u, OrderedDict(params)
@@ -1,4 +1,6 @@
 from .gensphnoise import *
+from .gencohnoise import *
+from .noisebank import *
+from .recnoise import *
 
-from . import functions 
-
+from . import functions
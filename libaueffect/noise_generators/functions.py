@@ -1,9 +1,16 @@
 import numpy as np
 import scipy.signal as sig
 import scipy.interpolate as interp
+from collections import OrderedDict
 
 speed_of_sound = 340 #m/s
 
+# Frame size used for block-wise noise generation when none is specified. 
+default_frame_size = 4096
+
+# Memory budget of the tables cached by each noise generator. 
+default_table_cache_bytes = 256 * 1024**2
+
 # Hoth Noise Specifications
 # For details, see p. 80 of
 # http://studylib.net/doc/18787871/ieee-std-269-2001-draft-standard-methods-for-measuring
@@ -43,6 +50,41 @@ def sample_sphere(num_points):
         loc_xyz[:,k] = [x,y,z]
     return loc_xyz
 
+class TableCache(object):
+    '''Bounded LRU cache of tables that depend on the FFT size, e.g., spectral shapes and steering phases. 
+
+    The least recently used tables are evicted when the total size of the cached arrays exceeds max_bytes. Tables larger than 
+    max_bytes are computed but not cached. 
+    '''
+    def __init__(self, max_bytes=default_table_cache_bytes):
+        self._max_bytes = max_bytes
+        self._tables = OrderedDict()
+        self._nbytes = 0
+
+    def fits(self, nbytes):
+        return nbytes <= self._max_bytes
+
+    def get(self, key, compute):
+        if key in self._tables:
+            self._tables.move_to_end(key)
+            return self._tables[key]
+
+        table = compute()
+        nbytes = _table_nbytes(table)
+        if self.fits(nbytes):
+            self._tables[key] = table
+            self._nbytes += nbytes
+            while self._nbytes > self._max_bytes:
+                self._nbytes -= _table_nbytes(self._tables.popitem(last=False)[1])
+        return table
+
+def _table_nbytes(table):
+    if isinstance(table, tuple):
+        return sum(_table_nbytes(t) for t in table)
+    return np.asarray(table).nbytes
+
+
+
 def get_hoth_mag(samp_rate, fft_size):
     fft_size_by_2 = int(fft_size / 2)
     hoth_mag = np.asarray(hoth_mag_db) - hoth_mag_db[hoth_index_1000_hz]
@@ -67,11 +109,34 @@ def get_hoth_mag(samp_rate, fft_size):
 
 
 
+def diffuse_coherence(mic_xyz, fft_size, samp_rate, sound_velocity=speed_of_sound):
+    # Spatial coherence of a spherically isotropic sound field, sin(kd)/(kd), between each pair of mics 
+    # for the frequency bins 0, 1, ..., fft_size/2. The result has a shape of (fft_size/2+1, num_mics, num_mics). 
+    d = np.linalg.norm(mic_xyz[:, np.newaxis, :] - mic_xyz[np.newaxis, :, :], axis=-1)
+    f = np.arange(0, fft_size // 2 + 1) * samp_rate / fft_size
+    return np.sinc(2 * f[:, np.newaxis, np.newaxis] * d[np.newaxis] / sound_velocity)
+
+def coherence_mixing_matrix(coherence):
+    # Factorize each coherence matrix as C = A A^H, so that A applied to mutually independent unit-variance signals 
+    # yields signals with the coherence C. Small negative eigenvalues due to rounding are set to zero. 
+    w, v = np.linalg.eigh(coherence)
+    return v * np.sqrt(np.maximum(w, 0))[..., np.newaxis, :]
+
+
+
+def steering_phases(tau, fft_size):
+    # exp(-j w tau) for the frequency bins 0, 1, ..., fft_size/2. The result has a shape of tau.shape + (fft_size/2+1,). 
+    w = 2*np.pi*np.arange(0,fft_size//2+1,1)/fft_size
+    return np.exp(-1j * np.asarray(tau)[..., np.newaxis] * w)
+
+
+
 # Follows
 # E.A.P. Habets and S. Gannot, Generating sensor signals in isotropic noise fields,
 # Journal of the Acoustical Society of America, Vol. 122, Issue 6, pp. 3464-3470, Dec. 2007.
 # added the spectral shaping to "Hoth" noise profile
-def generate_isotropic_noise(mic_xyz, N, samp_rate, type='sph', spectrum='hoth', num_points=64):
+# The spectral shape, sphere points and steering phases are taken from cache, a TableCache, if one is given. 
+def generate_isotropic_noise(mic_xyz, N, samp_rate, type='sph', spectrum='hoth', num_points=64, cache=None):
     num_mics = mic_xyz.shape[0]
     fft_size = int(2 ** np.ceil(np.log2(N)))
     fft_size_by_2 = int(fft_size/2)
@@ -79,32 +144,38 @@ def generate_isotropic_noise(mic_xyz, N, samp_rate, type='sph', spectrum='hoth',
     if num_mics == 1:
         num_points = 1
 
+    if cache is None:
+        cache = TableCache(max_bytes=0)
+
     # calculate relative microphone positions wrt mic 1
-    P_rel = np.zeros([num_mics,3])
-    for m in range(0,num_mics,1):
-        P_rel[m,:] = mic_xyz[m,:] - mic_xyz[0,:]
+    P_rel = mic_xyz - mic_xyz[0]
 
     # get locations uniformly sampled on a sphere
-    loc_xyz = sample_sphere(num_points)
+    loc_xyz = cache.get(('sphere', num_points), lambda: sample_sphere(num_points)[:, :num_points])
 
     if (spectrum == 'white'):
         g = 1
     elif (spectrum == 'hoth'):
-        g = get_hoth_mag(samp_rate, fft_size)
+        g = cache.get(('hoth', samp_rate, fft_size), lambda: get_hoth_mag(samp_rate, fft_size))
     else:
-        RuntimeError('spectrum must be \'white\' or \'hoth\'')
+        raise ValueError('spectrum must be \'white\' or \'hoth\'')
+
+    # delay of each point's plane wave at each mic, which is zero at mic 1
+    tau = (loc_xyz.T @ P_rel.T) * samp_rate / speed_of_sound
 
     # for each point, generate random noise in frequency domain and multiply by the steering vector
-    w = 2*np.pi*np.arange(0,fft_size_by_2+1,1)/fft_size
-    X = np.zeros([num_mics,fft_size_by_2 + 1], dtype=complex)
+    if cache.fits(tau.size * (fft_size_by_2 + 1) * np.dtype(complex).itemsize):
+        key = ('steering', samp_rate, fft_size, num_points, P_rel.tobytes())
+        steering = cache.get(key, lambda: steering_phases(tau, fft_size))
 
-    for i in range(0,num_points,1):
-        X_this = g * (np.random.normal(0,1,fft_size_by_2+1) + 1j*np.random.normal(0,1,fft_size_by_2+1))
-        X[0,:] = X[0,:] + X_this
-        for m in range(1,num_mics,1):
-            delta = np.sum(P_rel[m,:]*loc_xyz[:,i])
-            tau = delta * samp_rate / speed_of_sound
-            X[m,:] = X[m,:] + X_this*np.exp(-1j*tau*w)
+        Z = np.random.normal(0, 1, (num_points, 2, fft_size_by_2 + 1))
+        X = np.einsum('pf,pmf->mf', g * (Z[:, 0] + 1j * Z[:, 1]), steering)
+    else:
+        # The steering phases of long signals are computed point by point to save memory. 
+        X = np.zeros([num_mics,fft_size_by_2 + 1], dtype=complex)
+        for i in range(0,num_points,1):
+            Z = np.random.normal(0, 1, (2, fft_size_by_2 + 1))
+            X += g * (Z[0] + 1j * Z[1]) * steering_phases(tau[i], fft_size)
 
     X = X/np.sqrt(num_points)
 
@@ -120,3 +191,47 @@ def generate_isotropic_noise(mic_xyz, N, samp_rate, type='sph', spectrum='hoth',
     return n
 
 
+
+
+
+# Block-wise generation for long signals. 
+# Independent noise frames of frame_size samples are weighted by a sine window and overlap-added with a hop of frame_size/2. 
+# Since the squared windows sum to one, the stitched noise has the same variance, spectrum and inter-mic coherence as each frame. 
+def sine_window(frame_size):
+    return np.sin(np.pi * (np.arange(frame_size) + 0.5) / frame_size)
+
+def overlap_add_noise_blocks(draw_frames, N, frame_size, block_size, frames_per_draw=8):
+    # draw_frames(nframes) must return noise frames of shape (nframes, num_mics, frame_size). 
+    # The stitched signal of N samples is yielded in blocks of block_size samples, each of shape (num_mics, block_size). 
+    hop = frame_size // 2
+    window = sine_window(frame_size)
+
+    pending = []  # hops of output samples not yielded yet
+    npending = 0
+    tail = None  # windowed second half of the last frame
+    nyielded = 0
+    while nyielded < N:
+        frames = draw_frames(frames_per_draw) * window
+        for frame in frames:
+            # The first frame starts half a frame before the signal, so that every sample is covered by two frames. 
+            if tail is not None:
+                pending.append(tail + frame[:, :hop])
+                npending += hop
+            tail = frame[:, hop:]
+
+        while npending >= block_size or (npending > 0 and nyielded + npending >= N):
+            x = np.concatenate(pending, axis=1)
+            nout = min(block_size, N - nyielded)
+            yield x[:, :nout]
+            nyielded += nout
+            pending = [x[:, nout:]]
+            npending = x.shape[1] - nout
+            if nyielded >= N:
+                return
+
+def generate_isotropic_noise_blocks(mic_xyz, N, samp_rate, block_size, frame_size=4096, type='sph', spectrum='hoth', num_points=64, cache=None):
+    # Block-wise counterpart of generate_isotropic_noise. frame_size must be a power of two. 
+    if cache is None:
+        cache = TableCache()
+    draw_frames = lambda nframes: np.stack([generate_isotropic_noise(mic_xyz, frame_size, samp_rate, type=type, spectrum=spectrum, num_points=num_points, cache=cache) for i in range(nframes)])
+    return overlap_add_noise_blocks(draw_frames, N, frame_size, block_size)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import libaueffect
+
+import numpy as np
+
+
+
+class CoherentNoiseGenerator(object):
+    '''Spherically isotropic noise generated from the theoretical coherence matrix of the mic array. 
+
+    Instead of superposing plane waves from sampled points on a sphere, independent noise signals, one for each mic, are 
+    mixed in each frequency bin by a factor of the diffuse-field coherence matrix, sin(kd)/(kd). The cost is proportional to 
+    the squared number of mics and does not depend on the accuracy of the diffuse field. 
+    '''
+    def __init__(self, sound_velocity=340, fs=16000, micarray='circular7', spectral_shape='hoth', frame_size=None):
+
+        self._sound_velocity = libaueffect.checked_cast(sound_velocity, 'float')
+        self._fs = libaueffect.checked_cast(fs, 'int')
+
+        # spectrum shape - hoth or white
+        if spectral_shape in ('hoth', 'white'):
+            self._spectral_shape = spectral_shape
+        else:
+            raise ValueError('The spectral_shape value must be either hoth or white.')
+
+        # microphone array geometry
+        if micarray == 'circular7':
+            self._micarray = np.concatenate([np.zeros((1,3)), np.array([0.0425 * np.array([np.cos(i * np.pi/3), np.sin(i * np.pi/3), 0]) for i in range(6)])])
+        elif micarray == 'mono':
+            self._micarray = np.zeros((1,3))
+        else:
+            self._micarray = np.asarray(micarray)
+        self._nmics = self._micarray.shape[0]
+
+        # If given, noise is generated in frames of this size stitched by overlap-add instead of in one FFT of the whole signal. 
+        self._frame_size = None if frame_size is None else libaueffect.checked_cast(frame_size, 'int')
+        if self._frame_size is not None and (self._frame_size < 2 or self._frame_size & (self._frame_size - 1) != 0):
+            raise ValueError('frame_size must be a power of two: {}'.format(self._frame_size))
+
+        # Mixing matrices and spectral shapes for each FFT size. 
+        self._cache = libaueffect.noise_generators.functions.TableCache()
+
+        print('Instantiating {}'.format(self.__class__.__name__))
+        print('Sound velocity: {}'.format(self._sound_velocity))
+        print('Sampling frequency: {}'.format(self._fs))
+        print('Spectral shape: {}'.format(self._spectral_shape))
+        print('Mic array geometry: {}'.format(micarray))
+        print('Frame size: {}'.format(self._frame_size))
+        print('', flush=True)
+
+
+
+    def _get_tables(self, fft_size):
+        return self._cache.get(fft_size, lambda: self._compute_tables(fft_size))
+
+
+
+    def _compute_tables(self, fft_size):
+        coherence = libaueffect.noise_generators.functions.diffuse_coherence(self._micarray, fft_size, self._fs, self._sound_velocity)
+        mixing = libaueffect.noise_generators.functions.coherence_mixing_matrix(coherence)
+
+        if self._spectral_shape == 'hoth':
+            g = libaueffect.noise_generators.functions.get_hoth_mag(self._fs, fft_size)
+        else:
+            g = np.ones(fft_size // 2 + 1)
+
+        return mixing, g
+
+
+
+    def _synthesize_frames(self, fft_size, nframes):
+        # Generate nframes independent noise frames of fft_size samples. 
+        fft_size_by_2 = fft_size // 2
+        mixing, g = self._get_tables(fft_size)
+
+        # Mix independent complex Gaussian signals so that they have the diffuse-field coherence. 
+        Z = np.random.normal(0, 1, (nframes, 2, self._nmics, fft_size_by_2 + 1))
+        Z = Z[:, 0] + 1j * Z[:, 1]
+        X = np.einsum('fij,njf->nif', mixing, Z)
+        X *= g
+
+        # transform to time domain
+        X[..., 0] = np.sqrt(fft_size) * np.real(X[..., 0])
+        X[..., fft_size_by_2] = np.sqrt(fft_size) * np.real(X[..., fft_size_by_2])
+        X[..., 1:fft_size_by_2] = np.sqrt(fft_size_by_2) * X[..., 1:fft_size_by_2]
+
+        return np.fft.irfft(X, fft_size, axis=-1)
+
+
+
+    def __call__(self, nsamples):
+        if self._frame_size is not None:
+            return np.concatenate(list(self.generate_blocks(nsamples, nsamples)), axis=1)
+
+        fft_size = int(2 ** np.ceil(np.log2(nsamples)))
+        n = self._synthesize_frames(fft_size, 1)[0]
+        n = n[:, 0:nsamples]
+
+        return libaueffect.as_float(n)
+
+
+
+    def generate_blocks(self, nsamples, block_size):
+        frame_size = libaueffect.noise_generators.functions.default_frame_size if self._frame_size is None else self._frame_size
+        draw_frames = lambda nframes: self._synthesize_frames(frame_size, nframes)
+
+        for n in libaueffect.noise_generators.functions.overlap_add_noise_blocks(draw_frames, nsamples, frame_size, block_size):
+            yield libaueffect.as_float(n)
@@ -2,15 +2,13 @@
 
 import libaueffect
 
-import pyrirgen
-
 import numpy as np
 import math
 
 
 
 class SphericalNoiseGenerator(object):
-    def __init__(self, sound_velocity=340, fs=16000, micarray='circular7', spectral_shape='hoth', noise_points=64):
+    def __init__(self, sound_velocity=340, fs=16000, micarray='circular7', spectral_shape='hoth', noise_points=64, frame_size=None):
 
         self._sound_velocity = libaueffect.checked_cast(sound_velocity, 'float')
         self._fs = libaueffect.checked_cast(fs, 'int')
@@ -31,20 +29,42 @@ class SphericalNoiseGenerator(object):
 
         self._noise_points = noise_points
 
+        # Spectral shapes and steering phases for each FFT size. 
+        self._cache = libaueffect.noise_generators.functions.TableCache()
+
+        # If given, noise is generated in frames of this size stitched by overlap-add instead of in one FFT of the whole signal. 
+        self._frame_size = None if frame_size is None else libaueffect.checked_cast(frame_size, 'int')
+        if self._frame_size is not None and (self._frame_size < 2 or self._frame_size & (self._frame_size - 1) != 0):
+            raise ValueError('frame_size must be a power of two: {}'.format(self._frame_size))
+
         print('Instantiating {}'.format(self.__class__.__name__))
         print('Sound velocity: {}'.format(self._sound_velocity))
         print('Sampling frequency: {}'.format(self._fs))
         print('Spectral shape: {}'.format(self._spectral_shape))
         print('Mic array geometry: {}'.format(micarray))
         print('Number of noise points: {}'.format(noise_points))
+        print('Frame size: {}'.format(self._frame_size))
         print('', flush=True)
 
 
 
     def __call__(self, nsamples, micarray=None):
+        if self._frame_size is not None:
+            return np.concatenate(list(self.generate_blocks(nsamples, nsamples, micarray=micarray)), axis=1)
+
         if micarray is None:
-            return libaueffect.noise_generators.functions.generate_isotropic_noise(self._micarray, nsamples, self._fs, type='sph', spectrum=self._spectral_shape, num_points=self._noise_points)
+            n = libaueffect.noise_generators.functions.generate_isotropic_noise(self._micarray, nsamples, self._fs, type='sph', spectrum=self._spectral_shape, num_points=self._noise_points, cache=self._cache)
         else:
-            return libaueffect.noise_generators.functions.generate_isotropic_noise(micarray, nsamples, self._fs, type='sph', spectrum=self._spectral_shape, num_points=self._noise_points)
+            n = libaueffect.noise_generators.functions.generate_isotropic_noise(micarray, nsamples, self._fs, type='sph', spectrum=self._spectral_shape, num_points=self._noise_points, cache=self._cache)
 
+        return libaueffect.as_float(n)
+
+
+
+    def generate_blocks(self, nsamples, block_size, micarray=None):
+        if micarray is None:
+            micarray = self._micarray
+        frame_size = libaueffect.noise_generators.functions.default_frame_size if self._frame_size is None else self._frame_size
 
+        for n in libaueffect.noise_generators.functions.generate_isotropic_noise_blocks(micarray, nsamples, self._fs, block_size, frame_size=frame_size, type='sph', spectrum=self._spectral_shape, num_points=self._noise_points, cache=self._cache):
+            yield libaueffect.as_float(n)
@@ -6,7 +6,7 @@ import scipy.interpolate as interp
 
 
 class SphericalNoiseGenerator(object):
-    def __init__(self, sound_velocity=340, fs=16000, micarray='circular7', noise_points=64):
+    def __init__(self, sound_velocity=340, fs=16000, micarray='circular7', noise_points=64, frame_size=None):
 
         self._sound_velocity = libaueffect.checked_cast(sound_velocity, 'float')
         self._fs = libaueffect.checked_cast(fs, 'int')
@@ -26,17 +26,26 @@ class SphericalNoiseGenerator(object):
         else:
             self._npoints = noise_points
 
+        # If given, noise is generated in frames of this size stitched by overlap-add instead of in one FFT of the whole signal. 
+        self._frame_size = None if frame_size is None else libaueffect.checked_cast(frame_size, 'int')
+        if self._frame_size is not None and (self._frame_size < 2 or self._frame_size & (self._frame_size - 1) != 0):
+            raise ValueError('frame_size must be a power of two: {}'.format(self._frame_size))
+
         # This is the sampled locations. 
         self._loc_xyz = libaueffect.noise_generators.functions.sample_sphere(self._npoints)
 
         # Get the spectral shape. 
         self._get_hoth_mag()
 
+        # Interpolated spectral shapes and steering phases for each FFT size. 
+        self._cache = libaueffect.noise_generators.functions.TableCache()
+
         print('Instantiating {}'.format(self.__class__.__name__))
         print('Sound velocity: {}'.format(self._sound_velocity))
         print('Sampling frequency: {}'.format(self._fs))
         print('Mic array geometry: {}'.format(micarray))
         print('Number of noise source points: {}'.format(self._npoints))
+        print('Frame size: {}'.format(self._frame_size))
         print('', flush=True)
 
         self._tau = np.zeros((self._npoints, self._nmics))
@@ -48,33 +57,56 @@ class SphericalNoiseGenerator(object):
 
 
     def __call__(self, nsamples):
+        if self._frame_size is not None:
+            return np.concatenate(list(self.generate_blocks(nsamples, nsamples)), axis=1)
+
         # Calculate the FFT size. 
         fft_size = int(2 ** np.ceil(np.log2(nsamples)))
+
+        n = self._synthesize_frames(fft_size, 1)[0]
+        n = n[:, 0:nsamples]
+
+        return libaueffect.as_float(n)
+
+
+
+    def generate_blocks(self, nsamples, block_size):
+        frame_size = libaueffect.noise_generators.functions.default_frame_size if self._frame_size is None else self._frame_size
+        draw_frames = lambda nframes: self._synthesize_frames(frame_size, nframes)
+
+        for n in libaueffect.noise_generators.functions.overlap_add_noise_blocks(draw_frames, nsamples, frame_size, block_size):
+            yield libaueffect.as_float(n)
+
+
+
+    def _synthesize_frames(self, fft_size, nframes):
+        # Generate nframes independent noise frames of fft_size samples. 
         fft_size_by_2 = int(fft_size/2)
 
         # Get the interpolated spectral shape. 
-        g = self._get_hoth_mag_interp(fft_size)
+        g = self._cache.get(('hoth', fft_size), lambda: self._get_hoth_mag_interp(fft_size))
 
         # For each point, generate random noise in frequency domain and multiply by the steering vector
-        w = 2 * np.pi * np.arange(0, fft_size_by_2 + 1, 1) / fft_size
+        Z = np.random.normal(0, 1, (nframes, self._npoints, 2, fft_size_by_2 + 1))
+        Z = Z[:, :, 0] + 1j * Z[:, :, 1]
 
-        Z = np.random.normal(0, 1, (self._npoints, 2, fft_size_by_2 + 1))
-        Zr, Zi = np.split(Z, 2, axis=1)    
-        Z = Zr + 1j * Zi
-        Z = Z * np.exp(-1j * w[np.newaxis, np.newaxis] * self._tau[..., np.newaxis])
-        X = np.sum(Z, axis=0)
+        if self._cache.fits(self._tau.size * (fft_size_by_2 + 1) * np.dtype(complex).itemsize):
+            steering = self._cache.get(('steering', fft_size), lambda: libaueffect.noise_generators.functions.steering_phases(self._tau, fft_size))
+            X = np.einsum('npf,pmf->nmf', Z, steering)
+        else:
+            # The steering phases of long signals are computed point by point to save memory. 
+            X = np.zeros((nframes, self._nmics, fft_size_by_2 + 1), dtype=complex)
+            for i in range(self._npoints):
+                X += Z[:, i, np.newaxis] * libaueffect.noise_generators.functions.steering_phases(self._tau[i], fft_size)
         X = X / np.sqrt(self._npoints)
         X *= g[np.newaxis]
 
         # transform to time domain
-        X[:, 0] = np.sqrt(fft_size) * np.real(X[:, 0])
-        X[:, fft_size_by_2] = np.sqrt(fft_size) * np.real(X[:, fft_size_by_2])
-        X[:, 1:fft_size_by_2] = np.sqrt(fft_size_by_2) * X[:, 1:fft_size_by_2]
-
-        n = np.fft.irfft(X, fft_size, axis=1)
-        n = n[:, 0:nsamples]
+        X[..., 0] = np.sqrt(fft_size) * np.real(X[..., 0])
+        X[..., fft_size_by_2] = np.sqrt(fft_size) * np.real(X[..., fft_size_by_2])
+        X[..., 1:fft_size_by_2] = np.sqrt(fft_size_by_2) * X[..., 1:fft_size_by_2]
 
-        return n
+        return np.fft.irfft(X, fft_size, axis=-1)
 
 
     def _get_hoth_mag(self):
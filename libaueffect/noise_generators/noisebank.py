@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+import libaueffect
+
+import os, json, warnings
+import numpy as np
+
+
+
+# A noise bank consists of a flat float32 file holding a long multi-channel noise signal, interleaved sample by sample as in 
+# a wav file, and an index file (JSON) describing it. The signal is made circular, i.e., its end continues seamlessly into 
+# its beginning, so that crops may wrap around. 
+NOISEBANK_INDEX = 'noisebank.json'
+NOISEBANK_DATA = 'noisebank.f32'
+
+
+
+class NoiseBankWriter(object):
+    '''Write a noise bank block by block. 
+
+    The last crossfade samples written are cross-faded into the beginning of the signal with sine and cosine ramps, which 
+    keeps the variance and inter-channel coherence of the noise, and are then dropped. The bank thus holds the total number 
+    of samples written minus crossfade. 
+    '''
+    def __init__(self, outputdir, fs, nchannels, crossfade=4096, info=None):
+        self._outputdir = os.path.abspath(outputdir)
+        self._fs = fs
+        self._nchannels = nchannels
+        self._crossfade = crossfade
+        self._info = info
+        self._nsamples = 0
+
+        os.makedirs(self._outputdir, exist_ok=True)
+        self._datafile = os.path.join(self._outputdir, NOISEBANK_DATA)
+        self._fid = open(self._datafile, 'wb')
+
+
+
+    @property
+    def indexfile(self):
+        return os.path.join(self._outputdir, NOISEBANK_INDEX)
+
+
+
+    def write(self, x):
+        x = np.asarray(x)
+        if x.shape[0] != self._nchannels:
+            raise ValueError('Expected {} channels, got {}.'.format(self._nchannels, x.shape[0]))
+
+        self._fid.write(memoryview(np.ascontiguousarray(x.T, dtype='<f4')).cast('B'))
+        self._nsamples += x.shape[1]
+
+
+
+    def close(self):
+        if self._fid is None:
+            return
+        self._fid.close()
+        self._fid = None
+
+        nsamples = self._nsamples - self._crossfade
+        if nsamples < self._crossfade:
+            raise RuntimeError('The noise bank must be longer than twice the crossfade length ({} samples).'.format(self._crossfade))
+
+        # Make the signal circular. 
+        if self._crossfade > 0:
+            data = np.memmap(self._datafile, dtype='<f4', mode='r+', shape=(self._nsamples, self._nchannels))
+            ramp = np.sin(0.5 * np.pi * (np.arange(self._crossfade) + 0.5) / self._crossfade)[:, np.newaxis]
+            data[:self._crossfade] = ramp * data[:self._crossfade] + np.sqrt(1 - ramp**2) * data[nsamples:]
+            data.flush()
+            del data
+
+            with open(self._datafile, 'r+b') as f:
+                f.truncate(nsamples * self._nchannels * 4)
+
+        with open(self.indexfile, 'w') as f:
+            json.dump({'fs': self._fs,
+                       'nchannels': self._nchannels,
+                       'nsamples': nsamples,
+                       'data': NOISEBANK_DATA,
+                       'generator': self._info}, f, indent=4)
+
+
+
+class NoiseBankGenerator(object):
+    '''Draw noise from a noise bank created with tools/gen_noisebank.py. 
+
+    Each call returns a crop of the memory-mapped bank starting at a random position, with a random polarity. The same start 
+    and polarity apply to all the channels, so the inter-channel coherence is kept. Crops running past the end of the bank 
+    continue from its beginning. Crops longer than the bank therefore repeat the same noise, which is warned about. 
+
+    The bank is not resampled or remapped, so fs and nchannels must match those it was generated with. 
+    '''
+    def __init__(self, noisebank, nchannels, fs=16000):
+        nchannels = libaueffect.checked_cast(nchannels, 'int')
+        fs = libaueffect.checked_cast(fs, 'int')
+
+        indexfile = os.path.join(noisebank, NOISEBANK_INDEX) if os.path.isdir(noisebank) else noisebank
+        with open(indexfile) as f:
+            index = json.load(f)
+
+        self._fs = index['fs']
+        self._nchannels = index['nchannels']
+        self._nsamples = index['nsamples']
+        if self._fs != fs:
+            raise RuntimeError('The noise bank {} is sampled at {} Hz, not {} Hz.'.format(indexfile, self._fs, fs))
+        if self._nchannels != nchannels:
+            raise RuntimeError('The noise bank {} has {} channels, not {}.'.format(indexfile, self._nchannels, nchannels))
+
+        self._data = np.memmap(os.path.join(os.path.dirname(os.path.abspath(indexfile)), index['data']),
+                               dtype='<f4', mode='r', shape=(self._nsamples, self._nchannels))
+
+        print('Instantiating {}'.format(self.__class__.__name__))
+        print('Noise bank: {}'.format(indexfile))
+        print('Sampling frequency: {}'.format(self._fs))
+        print('Number of channels: {}'.format(self._nchannels))
+        print('Length in seconds: {}'.format(self._nsamples / self._fs))
+        print('', flush=True)
+
+
+
+    def _check_length(self, nsamples):
+        if nsamples > self._nsamples:
+            warnings.warn('{} samples requested from a noise bank of {} samples. The noise repeats.'.format(nsamples, self._nsamples))
+
+
+
+    def _read(self, start, length):
+        # Read length samples from position start, wrapping around the end of the bank. 
+        y = np.empty((self._nchannels, length), dtype=libaueffect.get_float_dtype())
+        t = 0
+        while t < length:
+            pos = (start + t) % self._nsamples
+            n = min(length - t, self._nsamples - pos)
+            y[:, t : t + n] = self._data[pos : pos + n].T
+            t += n
+        return y
+
+
+
+    def __call__(self, nsamples):
+        self._check_length(nsamples)
+        start = np.random.randint(0, self._nsamples)
+        polarity = np.random.choice([-1, 1])
+
+        n = self._read(start, nsamples)
+        n *= polarity
+        return n
+
+
+
+    def generate_blocks(self, nsamples, block_size):
+        self._check_length(nsamples)
+        start = np.random.randint(0, self._nsamples)
+        polarity = np.random.choice([-1, 1])
+
+        for t in range(0, nsamples, block_size):
+            n = self._read(start + t, min(block_size, nsamples - t))
+            n *= polarity
+            yield n
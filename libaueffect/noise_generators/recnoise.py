@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+import libaueffect
+
+import numpy as np
+
+
+
+class RecordedNoiseGenerator(object):
+    '''Draw noise from a catalogue of multi-channel noise recordings. 
+
+    The catalogue is a text file listing one audio file per line, e.g., created with tools/gen_filelist.py. The lengths of 
+    the files are taken from their headers once at start-up. If a header index filled by tools/gen_filelist.py is given, it 
+    is only read, since parallel mixing jobs share it. Each call picks a start position uniformly over the whole catalogue 
+    and reads only the requested segment. A segment running past the end of a file continues at the beginning of another 
+    randomly picked file. 
+
+    All the recordings must have nchannels channels, which must match the number of microphones of the room simulator. 
+    Recordings at other sampling frequencies are resampled segment by segment, so storing them at sample_rate is preferred. 
+    '''
+    def __init__(self, noiselist, nchannels, sample_rate=16000, header_index=None, min_length=1.0):
+        self._nchannels = libaueffect.checked_cast(nchannels, 'int')
+        self._sample_rate = libaueffect.checked_cast(sample_rate, 'int')
+        min_length = libaueffect.checked_cast(min_length, 'float')
+
+        with open(noiselist) as f:
+            files = [s.rstrip() for s in f if s.strip()]
+
+        # Look up the headers. 
+        if header_index is not None:
+            index = libaueffect.HeaderIndex(header_index, readonly=True)
+            headers = [index.lookup(f) for f in files]
+        else:
+            headers = [libaueffect.read_wavheader(f) for f in files]
+
+        # Keep the files with the expected number of channels and enough samples. Lengths are counted at sample_rate. 
+        self._files = []
+        lengths = []
+        for f, (nf, ch, fs, nb) in zip(files, headers):
+            nsamples = nf * self._sample_rate // fs
+            if ch == self._nchannels and nsamples >= min_length * self._sample_rate:
+                self._files.append(f)
+                lengths.append(nsamples)
+
+        if len(self._files) == 0:
+            raise RuntimeError('No {}-channel recording of {} seconds or longer is listed in {}.'.format(self._nchannels, min_length, noiselist))
+
+        self._lengths = np.array(lengths, dtype=np.int64)
+        self._offsets = np.concatenate([[0], np.cumsum(self._lengths)])
+
+        print('Instantiating {}'.format(self.__class__.__name__))
+        print('Noise recordings listed in {} are used.'.format(noiselist))
+        print('{} of {} files used.'.format(len(self._files), len(files)))
+        print('Total length in hours: {}'.format(self._offsets[-1] / self._sample_rate / 3600))
+        print('Number of channels: {}'.format(self._nchannels))
+        print('Sampling frequency: {}'.format(self._sample_rate))
+        print('Header index: {}'.format(header_index))
+        print('', flush=True)
+
+
+
+    def _plan_segments(self, nsamples):
+        # Returns a list of (file index, start, length) that together cover nsamples. 
+        pos = np.random.randint(0, self._offsets[-1])
+        i = np.searchsorted(self._offsets, pos, side='right') - 1
+        start = pos - self._offsets[i]
+
+        segments = []
+        t = 0
+        while t < nsamples:
+            length = min(nsamples - t, self._lengths[i] - start)
+            segments.append((i, start, length))
+            t += length
+
+            i = np.random.randint(0, len(self._files))
+            start = 0
+
+        return segments
+
+
+
+    def _read(self, i, start, length):
+        y = libaueffect.snip_wav(self._files[i], int(length), start=int(start), sample_rate=self._sample_rate)[0]
+        y = libaueffect.as_float(np.reshape(y, (-1, y.shape[-1])))
+
+        # Pad in case the header overstated the length. 
+        if y.shape[1] < length:
+            y = np.pad(y, ((0, 0), (0, length - y.shape[1])))
+        return y
+
+
+
+    def __call__(self, nsamples):
+        return np.concatenate([self._read(i, start, length) for i, start, length in self._plan_segments(nsamples)], axis=1)
+
+
+
+    def generate_blocks(self, nsamples, block_size):
+        # The segments are read block by block so that only one block is in memory at a time. 
+        segments = self._plan_segments(nsamples)
+
+        block = []
+        filled = 0
+        for i, start, length in segments:
+            while length > 0:
+                n = min(length, block_size - filled)
+                block.append(self._read(i, start, n))
+                filled += n
+                start += n
+                length -= n
+
+                if filled == block_size:
+                    yield np.concatenate(block, axis=1)
+                    block = []
+                    filled = 0
+
+        if filled > 0:
+            yield np.concatenate(block, axis=1)
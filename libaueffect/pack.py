@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+import os, json, threading
+
+from .audio import register_decoder
+
+
+
+# A packed corpus consists of a few large shard files holding the 16-bit PCM samples of many utterances back to back, and 
+# an index file (JSON) mapping each utterance ID to (shard number, byte offset, number of samples, number of channels, 
+# sampling rate). An utterance is addressed as '<index file>#<utterance ID>', which read_wav accepts like a file name. 
+PACK_INDEX_EXT = '.idx'
+PACK_PATH_SEP = '#'
+
+
+
+def packed_path(indexfile, uttid):
+    return '{}{}{}'.format(os.path.abspath(indexfile), PACK_PATH_SEP, uttid)
+
+
+
+class PackedCorpusWriter(object):
+    def __init__(self, outputdir, name='corpus', shard_size=2 * 1024**3):
+        self._outputdir = os.path.abspath(outputdir)
+        self._name = name
+        self._shard_size = shard_size
+
+        self._shards = []
+        self._utterances = {}
+        self._fid = None
+
+        os.makedirs(self._outputdir, exist_ok=True)
+
+
+
+    @property
+    def indexfile(self):
+        return os.path.join(self._outputdir, self._name + PACK_INDEX_EXT)
+
+
+
+    def _open_next_shard(self):
+        if self._fid is not None:
+            self._fid.close()
+        shard = '{}-{:05d}.pcm'.format(self._name, len(self._shards))
+        self._fid = open(os.path.join(self._outputdir, shard), 'wb')
+        self._shards.append(shard)
+
+
+
+    def add(self, uttid, x, sample_rate):
+        if uttid in self._utterances:
+            raise ValueError('Duplicate utterance ID: {}'.format(uttid))
+
+        x = np.atleast_2d(x)
+        nchannels, nsamples = x.shape
+        data = np.clip(np.round(x.T * 32768), -32768, 32767).astype('<i2')
+
+        if self._fid is None or (self._fid.tell() > 0 and self._fid.tell() + data.nbytes > self._shard_size):
+            self._open_next_shard()
+
+        offset = self._fid.tell()
+        self._fid.write(data.tobytes())
+        self._utterances[uttid] = [len(self._shards) - 1, offset, nsamples, nchannels, int(sample_rate)]
+
+        return packed_path(self.indexfile, uttid)
+
+
+
+    def close(self):
+        if self._fid is not None:
+            self._fid.close()
+            self._fid = None
+
+        with open(self.indexfile, 'w') as f:
+            json.dump({'shards': self._shards, 'utterances': self._utterances}, f)
+
+
+
+class PackedCorpus(object):
+    '''Reader of a packed corpus. Shard files are kept open and each utterance is fetched with a single pread.'''
+    def __init__(self, indexfile):
+        self._dir = os.path.dirname(os.path.abspath(indexfile))
+        with open(indexfile) as f:
+            index = json.load(f)
+        self._shards = index['shards']
+        self._utterances = index['utterances']
+        self._fds = {}
+        self._lock = threading.Lock()
+
+
+
+    def __del__(self):
+        for fd in self._fds.values():
+            os.close(fd)
+
+
+
+    def _fd(self, shard):
+        with self._lock:
+            if shard not in self._fds:
+                self._fds[shard] = os.open(os.path.join(self._dir, self._shards[shard]), os.O_RDONLY)
+            return self._fds[shard]
+
+
+
+    def header(self, uttid):
+        try:
+            _, _, nsamples, nchannels, fs = self._utterances[uttid]
+        except KeyError:
+            raise RuntimeError('Utterance {} is not found in the packed corpus.'.format(uttid))
+        return nsamples, nchannels, fs, 2
+
+
+
+    def read(self, uttid, start=0, length=None, channel=None):
+        try:
+            shard, offset, nsamples, nchannels, fs = self._utterances[uttid]
+        except KeyError:
+            raise RuntimeError('Utterance {} is not found in the packed corpus.'.format(uttid))
+
+        start = min(start, nsamples)
+        stop = nsamples if length is None else min(start + length, nsamples)
+        nbytes = 2 * nchannels * (stop - start)
+        data = os.pread(self._fd(shard), nbytes, offset + 2 * nchannels * start)
+        if len(data) != nbytes:
+            raise RuntimeError('Packed corpus is truncated: {}'.format(uttid))
+
+        x = np.frombuffer(data, dtype='<i2').reshape((-1, nchannels)).T
+        if channel == 'random':
+            channel = np.random.randint(0, nchannels)
+        if channel is not None:
+            x = x[channel]
+
+        y = x.astype(np.float32)
+        y *= 1. / float(1 << 15)
+        return y, fs
+
+
+
+class PackedCorpusDecoder(object):
+    '''Decoder for '<index file>#<utterance ID>' paths.'''
+    def __init__(self):
+        self._corpora = {}
+        self._lock = threading.Lock()
+
+
+    def accepts(self, path):
+        return PACK_PATH_SEP in path and path.rsplit(PACK_PATH_SEP, 1)[0].endswith(PACK_INDEX_EXT)
+
+
+    def _open(self, path):
+        indexfile, uttid = path.rsplit(PACK_PATH_SEP, 1)
+        with self._lock:
+            if indexfile not in self._corpora:
+                self._corpora[indexfile] = PackedCorpus(indexfile)
+            return self._corpora[indexfile], uttid
+
+
+    def stat(self, path):
+        return os.stat(path.rsplit(PACK_PATH_SEP, 1)[0])
+
+
+    def header(self, path):
+        corpus, uttid = self._open(path)
+        return corpus.header(uttid)
+
+
+    def read(self, path, start=0, length=None, channel=None):
+        corpus, uttid = self._open(path)
+        return corpus.read(uttid, start, length, channel)
+
+
+
+register_decoder(PackedCorpusDecoder())
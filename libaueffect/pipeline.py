@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import collections, functools, itertools, threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .audio import write_wav
+
+
+
+def prefetch(func, items, nworkers=4, depth=2):
+    '''Apply func to each item on a thread pool and yield the results in the order of the items. 
+
+    At most depth items are in flight at any time, so the results waiting to be consumed are bounded. With depth=0, func 
+    is called synchronously in the consuming thread.
+    '''
+    if depth <= 0:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=nworkers) as executor:
+        items = iter(items)
+        pending = collections.deque(executor.submit(func, item) for item in itertools.islice(items, depth))
+
+        while pending:
+            future = pending.popleft()
+            for item in itertools.islice(items, 1):
+                pending.append(executor.submit(func, item))
+            yield future.result()
+
+
+
+class AsyncWriter(object):
+    '''Run output jobs, such as write_wav, on background threads. 
+
+    The writer takes ownership of the arrays passed to it, so the caller must not modify them afterwards. At most max_pending 
+    jobs are queued; submitting more blocks until one of them has finished. Callbacks registered with then() run in the 
+    calling thread, in the order of registration, once all the jobs submitted before them have finished. This is used for 
+    writing list and log entries in order. submit() returns a Future holding the result of the job. With nworkers=0, every 
+    job runs synchronously. 
+    '''
+    def __init__(self, nworkers=2, max_pending=16):
+        self._nworkers = nworkers
+        self._queue = collections.deque()
+
+        if self._nworkers > 0:
+            self._executor = ThreadPoolExecutor(max_workers=nworkers)
+            self._slots = threading.BoundedSemaphore(max(max_pending, 1))
+        else:
+            self._executor = None
+
+
+    def submit(self, func, *args, **kwargs):
+        if self._executor is None:
+            future = Future()
+            future.set_result(func(*args, **kwargs))
+            return future
+
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(func, *args, **kwargs)
+        except:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+
+        self._queue.append(future)
+        self._drain(wait=False)
+        return future
+
+
+    def write_wav(self, x, path, **kwargs):
+        self.submit(write_wav, x, path, **kwargs)
+
+
+    def then(self, func, *args, **kwargs):
+        self._queue.append(functools.partial(func, *args, **kwargs))
+        self._drain(wait=(self._executor is None))
+
+
+    def _drain(self, wait):
+        while self._queue:
+            item = self._queue[0]
+            if isinstance(item, Future):
+                if not wait and not item.done():
+                    break
+                item.result()
+            else:
+                item()
+            self._queue.popleft()
+
+
+    def close(self):
+        try:
+            self._drain(wait=True)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+
+
+# Floating-point type of the signals handled by the mixers, i.e., sources, RIRs, source images, noise and mixtures. 
+# float64 reproduces the original behavior. float32 halves the memory footprint; see docs/mtgsim.md for the resulting 
+# deviation from the float64 output. 
+_float_dtype = np.dtype(np.float64)
+
+
+
+def set_float_dtype(dtype):
+    global _float_dtype
+
+    dtype = np.dtype(dtype)
+    if dtype not in (np.dtype(np.float32), np.dtype(np.float64)):
+        raise ValueError('The floating-point precision must be either float32 or float64: {}'.format(dtype))
+    _float_dtype = dtype
+
+
+
+def get_float_dtype():
+    return _float_dtype
+
+
+
+def as_float(x):
+    '''Cast an array to the current floating-point type without copying it if it already has that type.'''
+    return np.asarray(x, dtype=_float_dtype)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import scipy.signal
+
+import os, math, hashlib, tempfile
+
+
+
+# Bumped whenever the resampling filter changes so that cached entries made with another filter are not reused. 
+RESAMPLER_VERSION = 'kaiser_best'
+
+
+class PolyphaseResampler(object):
+    '''Rational-rate resampler for one (fs_in, fs_out) pair.
+
+    The Kaiser-windowed anti-aliasing filter, including the zero padding that centers the output samples, is designed once 
+    at construction; each call only runs the polyphase filtering. The default filter parameters are those of resampy's 
+    kaiser_best filter: the windowed sinc spans num_zeros zero crossings on each side, measured at the lower of the two 
+    rates, and its cutoff is rolloff times the lower Nyquist frequency. The output has int(nsamples * fs_out / fs_in) 
+    samples, which is what resampy returns.
+    '''
+    def __init__(self, fs_in, fs_out, num_zeros=64, rolloff=0.9475937167399596, beta=14.769656459379492):
+        g = math.gcd(int(fs_in), int(fs_out))
+        self._up = int(fs_out) // g
+        self._down = int(fs_in) // g
+
+        max_rate = max(self._up, self._down)
+        half_len = num_zeros * max_rate
+        h = scipy.signal.firwin(2 * half_len + 1, rolloff / max_rate, window=('kaiser', beta)) * self._up
+
+        n_pre_pad = self._down - half_len % self._down
+        self._n_pre_remove = (half_len + n_pre_pad) // self._down
+        self._h = np.concatenate([np.zeros(n_pre_pad), h])
+
+
+
+    def __call__(self, x, axis=-1):
+        x = np.asarray(x)
+        if self._up == self._down:
+            return x.copy()
+
+        n_out = x.shape[axis] * self._up // self._down
+        y = scipy.signal.upfirdn(self._h, x, self._up, self._down, axis=axis)
+        y = np.moveaxis(y, axis, -1)[..., self._n_pre_remove : self._n_pre_remove + n_out]
+        if y.shape[-1] < n_out:
+            y = np.pad(y, [(0, 0)] * (y.ndim - 1) + [(0, n_out - y.shape[-1])], mode='constant')
+
+        return np.moveaxis(y, -1, axis).astype(x.dtype if x.dtype.kind == 'f' else np.float32, copy=False)
+
+
+
+_resamplers = {}
+
+def get_resampler(fs_in, fs_out):
+    key = (int(fs_in), int(fs_out))
+    if key not in _resamplers:
+        _resamplers[key] = PolyphaseResampler(*key)
+    return _resamplers[key]
+
+
+
+def resample(x, fs_in, fs_out, axis=-1):
+    return get_resampler(fs_in, fs_out)(x, axis=axis)
+
+
+
+class ResampleCache(object):
+    '''On-disk cache of resampled audio files.
+
+    Each entry is a .npy file holding all channels of one source file at one target rate. The entry name is a hash of the 
+    absolute path, the modification time, the size and the target rate of the source and of the resampler version, so an 
+    edited file is never served from a stale entry. For virtual paths, the caller passes the stat of the file actually holding the samples. Entries are written atomically and can therefore be shared among parallel jobs.
+    '''
+    def __init__(self, cachedir):
+        self._cachedir = os.path.abspath(cachedir)
+        os.makedirs(self._cachedir, exist_ok=True)
+
+
+
+    def _entry(self, path, sample_rate, st):
+        st = os.stat(path) if st is None else st
+        key = '{}\0{}\0{}\0{}\0{}'.format(os.path.abspath(path), st.st_mtime_ns, st.st_size, int(sample_rate), RESAMPLER_VERSION)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self._cachedir, digest[:2], digest + '.npy')
+
+
+
+    def load(self, path, sample_rate, st=None):
+        entry = self._entry(path, sample_rate, st)
+        try:
+            return np.load(entry)
+        except (IOError, ValueError):
+            return None
+
+
+
+    def save(self, path, sample_rate, y, st=None):
+        entry = self._entry(path, sample_rate, st)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+
+        fd, tmpfile = tempfile.mkstemp(dir=os.path.dirname(entry), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, y)
+            os.replace(tmpfile, entry)
+        except:
+            if os.path.exists(tmpfile):
+                os.remove(tmpfile)
+            raise
+
+
+
+_resample_cache = None
+
+def set_resample_cache(cachedir):
+    '''Enable (or disable with None) the on-disk cache used by read_wav when resampling.'''
+    global _resample_cache
+    _resample_cache = None if cachedir is None else ResampleCache(cachedir)
+    return _resample_cache
+
+
+
+def get_resample_cache():
+    return _resample_cache
@@ -1,2 +1,5 @@
+from .ism import *
 from .genrir import *
+from .hybrid import *
 from .rir_from_file import *
+from .rirbank import *
@@ -1,10 +1,17 @@
 # -*- coding: utf-8 -*-
 import libaueffect
 
-import pyrirgen
-
 import numpy as np
 import math
+import concurrent.futures
+import multiprocessing
+
+from .ism import image_source_rirs
+
+try:
+    import pyrirgen
+except ImportError:
+    pyrirgen = None
 
 
 
@@ -18,7 +25,11 @@ class RandomRirGenerator(object):
                  t60_range = [0.1, 0.4], 
                  min_angle_diff = 30, 
                  max_angle_diff = 360, 
-                 micarray='circular7'):
+                 micarray='circular7', 
+                 num_workers=1, 
+                 parallel_backend='process', 
+                 engine='auto', 
+                 truncate_db=None):
 
         self._sound_velocity = libaueffect.checked_cast(sound_velocity, 'float')
         self._fs = libaueffect.checked_cast(fs, 'int')
@@ -47,6 +58,25 @@ class RandomRirGenerator(object):
         if self._min_angle_diff >= self._max_angle_diff:
             raise ValueError('min_angle_diff (given: {}) must be smaller than max_angle_diff (given: {}).'.format(self._min_angle_diff, self._max_angle_diff))
 
+        # RIR tails below this level relative to the total energy are cut off. 
+        self._truncate_db = None if truncate_db is None else libaueffect.checked_cast(truncate_db, 'float')
+
+        # RIR engine: pyrirgen or the NumPy image-source implementation. auto prefers pyrirgen if it is installed. 
+        if engine == 'auto':
+            engine = 'numpy' if pyrirgen is None else 'pyrirgen'
+        if engine not in ('pyrirgen', 'numpy'):
+            raise ValueError('engine must be auto, pyrirgen or numpy: {}'.format(engine))
+        if engine == 'pyrirgen' and pyrirgen is None:
+            raise RuntimeError('pyrirgen is not installed. Use engine=numpy instead.')
+        self._engine = engine
+
+        # RIRs of different speakers can be computed in parallel. 
+        self._num_workers = libaueffect.checked_cast(num_workers, 'int')
+        self._parallel_backend = parallel_backend
+        if self._parallel_backend not in ('thread', 'process'):
+            raise ValueError('parallel_backend must be either thread or process: {}'.format(self._parallel_backend))
+        self._executor = None
+
         # microphone array geometry
         if micarray == 'circular7':
             self._micarray = np.concatenate([np.zeros((1,3)), np.array([0.0425 * np.array([np.cos(i * np.pi/3), np.sin(i * np.pi/3), 0]) for i in range(6)])])  # 7x3 array
@@ -86,14 +116,16 @@ class RandomRirGenerator(object):
 
         print('Mic array geometry: {}'.format(micarray))
 
+        print('RIR engine: {}'.format(self._engine))
+        print('RIR truncation level: {} dB'.format(self._truncate_db))
+        print('Number of workers for RIR computation: {} ({})'.format(self._num_workers, self._parallel_backend))
+
         print('', flush=True)
 
 
 
-    def __call__(self, nspeakers=2, info_as_display_style=False):
-        success = False
-        
-        while not success:
+    def _sample_room(self):
+        while True:
             # Randomly sample room dimensions. 
             L = np.array([np.random.uniform(*self._roomdim_range_x), 
                           np.random.uniform(*self._roomdim_range_y), 
@@ -101,17 +133,20 @@ class RandomRirGenerator(object):
 
             # Randomly sample T60. 
             rt = np.random.uniform(*self._t60_range)
-            rirlen = int(rt * self._fs)
 
             # validity check
             V = np.prod(L)
             S = 2 * (L[0]*L[2] + L[1]*L[2] + L[0]*L[1])
             alpha = 24 * V * np.log(10) / (self._sound_velocity * S * rt)
             if alpha < 1:
-                success = True
+                return L, rt
+
 
+
+    def _sample_mic(self, L):
         # Randomly sample a mic array location. 
         if self._micpos == 'center':
+            corner = None
             room_center = L / 2
             r = np.array([np.random.uniform(room_center[0] - self._roomcenter_mic_dist_max_x, room_center[0] + self._roomcenter_mic_dist_max_x),
                           np.random.uniform(room_center[1] - self._roomcenter_mic_dist_max_y, room_center[1] + self._roomcenter_mic_dist_max_y),
@@ -123,6 +158,7 @@ class RandomRirGenerator(object):
         elif self._micpos == 'corner':
             corner_x = 'origin' if np.random.choice([0, 1]) == 1 else 'end'
             corner_y = 'origin' if np.random.choice([0, 1]) == 1 else 'end'
+            corner = (corner_x, corner_y)
             r = np.array([np.random.uniform(0.0425, self._corner_mic_dist_max_x) if corner_x == 'origin'
                           else np.random.uniform(L[0] - self._corner_mic_dist_max_x, L[0] - 0.0425), 
                           np.random.uniform(0.0425, self._corner_mic_dist_max_y) if corner_y == 'origin'
@@ -134,7 +170,11 @@ class RandomRirGenerator(object):
         else:
             raise ValueError('micpos must be either center or corner: {}'.format(self._micpos))
 
+        return r, R, corner
+
 
+
+    def _sample_ellipse(self):
         # Randomly sample an ellipse on which sources will be located. 
         ellipse_xaxis = np.random.uniform(*self._spkr_mic_dist_range_x)
         ellipse_yaxis = np.random.uniform(*self._spkr_mic_dist_range_y)
@@ -142,38 +182,106 @@ class RandomRirGenerator(object):
         # Randomly sample a base height. 
         base_height = np.random.uniform(*self._spkr_mic_dist_range_z)
 
+        return ellipse_xaxis, ellipse_yaxis, base_height
+
+
+
+    def _sample_source(self, L, r, corner, ellipse):
+        ellipse_xaxis, ellipse_yaxis, base_height = ellipse
+
+        # Randomly draw a speaker location.
+        theta = np.random.uniform(0, 2 * np.pi)
+        x_offset = ellipse_xaxis * np.cos(theta)
+        y_offset = ellipse_yaxis * np.sin(theta)
+        z_offset = base_height + np.random.uniform(-0.1, 0.1)  # allow small fluctuation in height
+
+        if corner is not None:
+            corner_x, corner_y = corner
+            x_offset = np.abs(x_offset) if corner_x == 'origin' else -np.abs(x_offset)
+            y_offset = np.abs(y_offset) if corner_y == 'origin' else -np.abs(y_offset)
+
+        s = np.array([r[0] + x_offset, r[1] + y_offset, r[2] + z_offset])
+        s = np.maximum(s, 0)
+        s = np.minimum(s, L)
+
+        return s
+
+
+
+    def __getstate__(self):
+        # The worker pool cannot be pickled. 
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        return state
+
+
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self._parallel_backend == 'thread':
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self._num_workers)
+            else:
+                # Worker processes are spawned rather than forked because the caller may be running other threads. 
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self._num_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+
+
+    def compute_rir(self, L, s, R, rt):
+        rirlen = int(rt * self._fs)
+        return libaueffect.as_float(_generate_rir(self._engine, L, s, R, self._sound_velocity, self._fs, rt, rirlen))
+
+
+
+    def compute_rirs(self, L, S, R, rt):
+        '''Compute the RIRs from each of the source locations S. The results are the same as those of compute_rir.'''
+        rirlen = int(rt * self._fs)
+
+        if self._num_workers <= 1 or len(S) <= 1:
+            if self._engine == 'numpy':
+                # All the sources are computed in one batch. 
+                h = image_source_rirs(L, S, R, sound_velocity=self._sound_velocity, fs=self._fs, reverb_time=rt, nsamples=rirlen)
+                return [libaueffect.as_float(h0) for h0 in h]
+            else:
+                return [self.compute_rir(L, s, R, rt) for s in S]
+
+        n = len(S)
+        h = self._get_executor().map(_generate_rir, [self._engine] * n, [L] * n, S, [R] * n, [self._sound_velocity] * n, [self._fs] * n, [rt] * n, [rirlen] * n)
+        return [libaueffect.as_float(h0) for h0 in h]
+
+
+
+    def sample_room_positions(self, npositions):
+        '''Sample a room, a mic array location and npositions candidate source locations without computing any RIRs. 
+
+        The angle constraints are not applied because they depend on which sources are used together. 
+        '''
+        L, rt = self._sample_room()
+        r, R, corner = self._sample_mic(L)
+        ellipse = self._sample_ellipse()
+        S = np.stack([self._sample_source(L, r, corner, ellipse) for i in range(npositions)])
+        return L, rt, r, R, S
+
+
+
+    def __call__(self, nspeakers=2, info_as_display_style=False, remove_delay=False):
+        L, rt = self._sample_room()
+        r, R, corner = self._sample_mic(L)
+        ellipse = self._sample_ellipse()
+
+        # Place all the speakers first. 
         mic2src_vecs = []
-        h = []
+        S = []
         spkr_locations = []
         for i in range(nspeakers):
             max_trials = 1000
             
             for trial in range(max_trials):
-                # Randomly draw a speaker location.
-                theta = np.random.uniform(0, 2 * np.pi)
-                x_offset = ellipse_xaxis * np.cos(theta)
-                y_offset = ellipse_yaxis * np.sin(theta)
-                z_offset = base_height + np.random.uniform(-0.1, 0.1)  # allow small fluctuation in height
-
-                if self._micpos == 'corner':
-                    x_offset = np.abs(x_offset) if corner_x == 'origin' else -np.abs(x_offset)
-                    y_offset = np.abs(y_offset) if corner_y == 'origin' else -np.abs(y_offset)
-
-                s = np.array([r[0] + x_offset, r[1] + y_offset, r[2] + z_offset])
-                s = np.maximum(s, 0)
-                s = np.minimum(s, L)
-
-                mic2src = s[:2] - r[:2]
-                mic2src = mic2src / np.linalg.norm(mic2src)
+                s = self._sample_source(L, r, corner, ellipse)
 
                 # Check if the direction of the new source is valid with respect to the previously generated ones. 
-                valid = True
-                for m2s in mic2src_vecs:
-                    angle_diff = math.degrees(np.arccos(np.clip(np.dot(mic2src, m2s), -1, 1)))
-                    if angle_diff < self._min_angle_diff:
-                        valid = False
-                    if angle_diff > self._max_angle_diff:
-                        valid = False
+                mic2src = mic_to_source_direction(r, s)
+                valid = is_valid_direction(mic2src, mic2src_vecs, self._min_angle_diff, self._max_angle_diff)
                 if valid:
                     break
 
@@ -182,30 +290,20 @@ class RandomRirGenerator(object):
             # print('Tried {} times.'.format(trial))
 
             mic2src_vecs.append(mic2src)
+            S.append(s)
+            spkr_locations.append(speaker_location(r, s))
 
-            angle = math.degrees(np.arctan2(s[1]-r[1], s[0]-r[0])) + 180
-            dist_2d = np.linalg.norm(s[:2] - r[:2])
-            dist_3d = np.linalg.norm(s - r)
-            height = s[2] - r[2]
-            
-            h0 = np.array(pyrirgen.generateRir(L, s, R, soundVelocity=self._sound_velocity, fs=self._fs, reverbTime=rt, nSamples=rirlen))
+        # Then compute their RIRs, possibly in parallel. 
+        h = self.compute_rirs(L, S, R, rt)
 
-            #import matplotlib.pyplot as plt
-            #plt.figure()
-            #plt.plot(h0[0])
-            #plt.show()
-       
-            h.append(h0)
-            spkr_locations.append([angle, dist_2d, dist_3d, height])
+        # The direct-path delay is known from the geometry. 
+        if remove_delay:
+            h = libaueffect.remove_delay_from_rirs(h, delay=libaueffect.direct_path_delay(S, R, self._sound_velocity, self._fs))
+        if self._truncate_db is not None:
+            h = libaueffect.truncate_rirs(h, self._truncate_db)
 
         # Print the simulated enviroment. 
-        print('Room dimensions: [{:6.3f} m, {:6.3f} m, {:6.3f} m]'.format(L[0], L[1], L[2]))
-        print('T60: {:6.3f} s'.format(rt))
-        print('Mic-array: [{:6.3f} m, {:6.3f} m, {:6.3f} m]'.format(r[0], r[1], r[2]))
-        
-        for i in range(nspeakers):
-            print('Speaker {}: [angle, distance from mic (2d), distance from mic (3d), height relative to mic] = [{:6.3f} deg, {:6.3f} m, {:6.3f} m, {:6.3f} m]'.format(i, spkr_locations[i][0], spkr_locations[i][1], spkr_locations[i][2], spkr_locations[i][3]))
-        print('', flush=True)
+        print_room(L, rt, r, spkr_locations)
 
         # return
         if info_as_display_style:
@@ -213,3 +311,50 @@ class RandomRirGenerator(object):
             return h, info
         else:
             return h, rt, spkr_locations
+
+
+
+def _generate_rir(engine, L, s, R, sound_velocity, fs, rt, rirlen):
+    if engine == 'numpy':
+        return image_source_rirs(L, [s], R, sound_velocity=sound_velocity, fs=fs, reverb_time=rt, nsamples=rirlen)[0]
+    else:
+        return pyrirgen.generateRir(L, s, R, soundVelocity=sound_velocity, fs=fs, reverbTime=rt, nSamples=rirlen)
+
+
+
+def mic_to_source_direction(r, s):
+    mic2src = s[:2] - r[:2]
+    return mic2src / np.linalg.norm(mic2src)
+
+
+
+def is_valid_direction(mic2src, mic2src_vecs, min_angle_diff, max_angle_diff):
+    # Check the angle between the new source and each of the previously placed ones. 
+    for m2s in mic2src_vecs:
+        angle_diff = math.degrees(np.arccos(np.clip(np.dot(mic2src, m2s), -1, 1)))
+        if angle_diff < min_angle_diff:
+            return False
+        if angle_diff > max_angle_diff:
+            return False
+    return True
+
+
+
+def speaker_location(r, s):
+    # [angle, distance from mic (2d), distance from mic (3d), height relative to mic]
+    angle = math.degrees(np.arctan2(s[1]-r[1], s[0]-r[0])) + 180
+    dist_2d = np.linalg.norm(s[:2] - r[:2])
+    dist_3d = np.linalg.norm(s - r)
+    height = s[2] - r[2]
+    return [angle, dist_2d, dist_3d, height]
+
+
+
+def print_room(L, rt, r, spkr_locations):
+    print('Room dimensions: [{:6.3f} m, {:6.3f} m, {:6.3f} m]'.format(L[0], L[1], L[2]))
+    print('T60: {:6.3f} s'.format(rt))
+    print('Mic-array: [{:6.3f} m, {:6.3f} m, {:6.3f} m]'.format(r[0], r[1], r[2]))
+    
+    for i in range(len(spkr_locations)):
+        print('Speaker {}: [angle, distance from mic (2d), distance from mic (3d), height relative to mic] = [{:6.3f} deg, {:6.3f} m, {:6.3f} m, {:6.3f} m]'.format(i, spkr_locations[i][0], spkr_locations[i][1], spkr_locations[i][2], spkr_locations[i][3]))
+    print('', flush=True)
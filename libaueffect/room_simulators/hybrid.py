@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import libaueffect
+
+import numpy as np
+import scipy.signal
+
+from .genrir import RandomRirGenerator
+from .ism import image_source_rirs
+
+
+
+class HybridRirGenerator(RandomRirGenerator):
+    '''Room simulator combining exact early reflections with a statistical late tail. 
+
+    Rooms and source locations are sampled as in RandomRirGenerator. The image sources arriving before transition_time 
+    (optionally limited to max_order) are computed exactly with the NumPy image-source engine. After that, the RIR is 
+    continued by noise that has the spatial coherence of a diffuse field at the mic array. Its energy envelope is the decay 
+    implied by the wall reflection coefficients of the sampled T60, averaged over directions. The tail level is matched to 
+    the energy of the exact part just before the transition, and the two parts are cross-faded over crossfade_time. 
+    '''
+    def __init__(self, transition_time=0.05, crossfade_time=0.008, max_order=-1, **kwargs):
+        kwargs['engine'] = 'numpy'
+        super().__init__(**kwargs)
+
+        self._transition_time = libaueffect.checked_cast(transition_time, 'float')
+        self._crossfade_time = libaueffect.checked_cast(crossfade_time, 'float')
+        self._max_order = libaueffect.checked_cast(max_order, 'int')
+
+        # The level of the tail is matched to the exact part over the samples preceding the transition. 
+        if int(self._transition_time * self._fs) < 1:
+            raise ValueError('transition_time (given: {}) must be at least one sample long.'.format(self._transition_time))
+
+        # Directions over which the decay is averaged (Fibonacci sphere, folded into the first octant). 
+        ndirs = 512
+        z = np.linspace(-1, 1, ndirs)
+        phi = np.arange(ndirs) * np.pi * (3 - np.sqrt(5))
+        self._directions = np.abs(np.stack([np.sqrt(1 - z**2) * np.cos(phi), np.sqrt(1 - z**2) * np.sin(phi), z]))
+
+        # tail mixing matrices for each FFT size and array geometry
+        self._mixing = {}
+
+        print('Transition time: {} s'.format(self._transition_time))
+        print('Cross-fade time: {} s'.format(self._crossfade_time))
+        print('Maximum reflection order of the early part: {}'.format(self._max_order))
+        print('', flush=True)
+
+
+
+    def _decay_envelope(self, L, rt, t):
+        # Expected energy per sample of the image-source RIR at time t. Each image at distance ct contributes 1/(4 pi ct)^2 
+        # and images are 1/V apart, which gives c/(4 pi V fs) times the direction-averaged product of the reflection 
+        # coefficients, 1 - alpha per wall hit. 
+        V = np.prod(L)
+        S = 2 * (L[0]*L[2] + L[1]*L[2] + L[0]*L[1])
+        alpha = 24 * V * np.log(10) / (self._sound_velocity * S * rt)
+        hits_per_meter = np.sum(self._directions / L[:, np.newaxis], axis=0)
+        decay = np.mean(np.power(1 - alpha, self._sound_velocity * t[:, np.newaxis] * hits_per_meter[np.newaxis]), axis=1)
+        return self._sound_velocity / (4 * np.pi * V * self._fs) * decay
+
+
+
+    def _coherent_noise(self, R, nsamples):
+        fft_size = int(2 ** np.ceil(np.log2(max(nsamples, 2))))
+
+        # The matrices are computed from the mic positions relative to the first mic, rounded to a nanometer. Thus, the same 
+        # array placed anywhere in any room gets exactly the same matrix, regardless of the order in which rooms are computed. 
+        Rrel = np.round(R - R[0], 9) + 0.0
+        key = (fft_size, Rrel.tobytes())
+        if key not in self._mixing:
+            C = libaueffect.noise_generators.functions.diffuse_coherence(Rrel, fft_size, self._fs, self._sound_velocity)
+            self._mixing[key] = libaueffect.noise_generators.functions.coherence_mixing_matrix(C)
+        A = self._mixing[key]
+
+        # Color independent white noise with the diffuse-field coherence. The diagonal of the coherence is one, so each 
+        # channel keeps unit variance. 
+        W = np.fft.rfft(np.random.standard_normal((R.shape[0], fft_size)), axis=1)
+        X = np.einsum('fmk,kf->mf', A, W)
+        return np.fft.irfft(X, fft_size, axis=1)[:, :nsamples]
+
+
+
+    def _highpass(self, h):
+        # 'Original' high-pass filter as proposed by Allen and Berkley, as applied by the image-source engines. 
+        W = 2 * np.pi * 100 / self._fs
+        R1 = np.exp(-W)
+        B1 = 2 * R1 * np.cos(W)
+        B2 = -R1 * R1
+        A1 = -(1 + R1)
+        return scipy.signal.lfilter([1, A1, R1], [1, -B1, -B2], h, axis=-1)
+
+
+
+    def compute_rir(self, L, s, R, rt):
+        return self.compute_rirs(L, [s], R, rt)[0]
+
+
+
+    def compute_rirs(self, L, S, R, rt):
+        rirlen = int(rt * self._fs)
+        ntrans = min(int(self._transition_time * self._fs), rirlen)
+        nfade = min(int(self._crossfade_time * self._fs), rirlen - ntrans)
+        nwin = max(ntrans // 4, 1)
+
+        # exact early part
+        early = image_source_rirs(L, S, R, sound_velocity=self._sound_velocity, fs=self._fs, reverb_time=rt, 
+                                  nsamples=ntrans + nfade, order=self._max_order, hp_filter=False)
+
+        h = np.zeros((len(S), R.shape[0], rirlen))
+        h[..., :ntrans + nfade] = early
+
+        if ntrans < rirlen:
+            envelope = self._decay_envelope(L, rt, np.arange(ntrans - nwin, rirlen) / self._fs)
+
+            # Level of the exact part just before the transition, measured after the high-pass filter as the tail has no 
+            # DC component. 
+            ref = np.mean(self._highpass(early)[..., ntrans - nwin : ntrans]**2, axis=(1, 2))
+            model = np.mean(envelope[:nwin])
+            envelope = envelope[nwin:]
+
+            # Energy-preserving cross-fade. 
+            fade = np.sin(0.5 * np.pi * (np.arange(nfade) + 0.5) / nfade)**2 if nfade > 0 else np.zeros(0)
+            h[..., ntrans : ntrans + nfade] *= np.sqrt(1 - fade)
+            fade_in = np.concatenate([np.sqrt(fade), np.ones(rirlen - ntrans - nfade)])
+
+            for i in range(len(S)):
+                tail = self._coherent_noise(R, rirlen - ntrans)
+                h[i, :, ntrans:] += np.sqrt(ref[i] / model * envelope) * fade_in * tail
+
+        h = self._highpass(h)
+        return [libaueffect.as_float(h0) for h0 in h]
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import scipy.signal
+
+
+
+def image_source_rirs(L, S, R, sound_velocity=340, fs=16000, reverb_time=0.5, nsamples=None, order=-1, hp_filter=True, max_images=1<<16):
+    '''Compute the RIRs from each source in S to each mic in R of a shoebox room with the image-source method. 
+
+    This follows the algorithm of Habets' RIR generator, which pyrirgen wraps, for omnidirectional mics: the wall reflection 
+    coefficients are derived from reverb_time with Sabine's formula, each image is placed with a Hann-windowed sinc 
+    fractional-delay filter, and the Allen-Berkley high-pass filter is applied if hp_filter is True. The image geometry and 
+    reflection coefficients are separable along the three axes, so they are evaluated on small per-axis grids and combined 
+    by broadcasting. The images of each source-mic pair are then rendered in chunks of at most max_images. 
+
+    Returns an array of shape (number of sources, number of mics, nsamples). 
+    '''
+    L = np.asarray(L, dtype=np.float64)
+    S = np.atleast_2d(np.asarray(S, dtype=np.float64))
+    R = np.atleast_2d(np.asarray(R, dtype=np.float64))
+
+    # reflection coefficients
+    V = np.prod(L)
+    A = 2 * (L[0]*L[2] + L[1]*L[2] + L[0]*L[1])
+    if reverb_time != 0:
+        alpha = 24 * V * np.log(10.0) / (sound_velocity * A * reverb_time)
+        if alpha > 1:
+            raise ValueError('Error: The reflection coefficients cannot be calculated using the current room parameters, i.e. room size and reverberation time.')
+        beta = np.full(6, np.sqrt(1 - alpha))
+    else:
+        beta = np.zeros(6)
+
+    if nsamples is None or nsamples < 0:
+        nsamples = int(reverb_time * fs)
+
+    # Distances are measured in samples. 
+    cTs = sound_velocity / fs
+    L = L / cTs
+    S = S / cTs
+    R = R / cTs
+
+    Tw = 2 * int(np.round(0.004 * fs))
+
+    # Per-axis image indices (m, q), their reflection coefficients and orders. 
+    axes = []
+    for d in range(3):
+        n = int(np.ceil(nsamples / (2 * L[d])))
+        m = np.repeat(np.arange(-n, n + 1), 2)
+        q = np.tile([0, 1], 2 * n + 1)
+        refl = np.power(beta[2*d], np.abs(m - q)) * np.power(beta[2*d+1], np.abs(m))
+        axes.append((m, q, refl, np.abs(2 * m - q)))
+
+    refl = axes[0][2][:, None, None] * axes[1][2][None, :, None] * axes[2][2][None, None, :]
+    if order >= 0:
+        valid_order = (axes[0][3][:, None, None] + axes[1][3][None, :, None] + axes[2][3][None, None, :]) <= order
+    else:
+        valid_order = None
+
+    h = np.zeros((len(S), len(R), nsamples))
+    for i, s in enumerate(S):
+        for j, r in enumerate(R):
+            # Image-to-mic vectors along each axis. 
+            dx, dy, dz = [(1 - 2 * q) * s[d] - r[d] + 2 * m * L[d] for d, (m, q, _, _) in enumerate(axes)]
+            dist = np.sqrt(dx[:, None, None]**2 + dy[None, :, None]**2 + dz[None, None, :]**2)
+
+            keep = dist < nsamples
+            if valid_order is not None:
+                keep &= valid_order
+            dist = dist[keep]
+            gain = refl[keep] / (4 * np.pi * dist * cTs)
+
+            fdist = np.floor(dist)
+            frac = dist - fdist
+            start = fdist.astype(np.int64) - Tw // 2 + 1
+
+            # Samples are accumulated with an offset of Tw so that the taps falling outside [0, nsamples) land in the margins. 
+            acc = np.zeros(nsamples + 2 * Tw)
+            for k in range(0, len(dist), max_images):
+                lpi = _fractional_delay_filters(frac[k : k + max_images], gain[k : k + max_images], Tw)
+                pos = (start[k : k + max_images, None] + Tw) + np.arange(Tw)[None, :]
+                acc += np.bincount(pos.ravel(), weights=lpi.ravel(), minlength=len(acc))
+
+            h[i, j] = acc[Tw : Tw + nsamples]
+
+    # 'Original' high-pass filter as proposed by Allen and Berkley. 
+    if hp_filter:
+        W = 2 * np.pi * 100 / fs
+        R1 = np.exp(-W)
+        B1 = 2 * R1 * np.cos(W)
+        B2 = -R1 * R1
+        A1 = -(1 + R1)
+        h = scipy.signal.lfilter([1, A1, R1], [1, -B1, -B2], h, axis=-1)
+
+    return h
+
+
+
+def _fractional_delay_filters(frac, gain, Tw):
+    # Hann-windowed sinc filters delaying by frac samples and scaled by gain, i.e., for n = 1, ..., Tw and t = n - frac, 
+    # gain * 0.5 * (1 - cos(2 pi t / Tw)) * sinc(t - Tw / 2). 
+    # With k = n - Tw / 2, which is an integer, sin(pi (k - frac)) = -(-1)^k sin(pi frac) and 
+    # cos(2 pi t / Tw) = cos(2 pi n / Tw) cos(2 pi frac / Tw) + sin(2 pi n / Tw) sin(2 pi frac / Tw), so the filter is 
+    # gain * sin(pi frac) / pi * (a_n + b_n cos(2 pi frac / Tw) + c_n sin(2 pi frac / Tw)) / (k - frac). 
+    # This turns the per-tap trigonometric functions into a small matrix product. 
+    n = np.arange(1, Tw + 1)
+    k = n - Tw // 2
+    sign = np.where(k % 2 == 0, -1.0, 1.0)
+    basis = 0.5 * sign * np.stack([np.ones(Tw), -np.cos(2 * np.pi * n / Tw), -np.sin(2 * np.pi * n / Tw)])
+
+    b = 2 * np.pi * frac / Tw
+    coefs = np.stack([np.ones(len(frac)), np.cos(b), np.sin(b)], axis=1)
+    h = coefs @ basis
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        h /= k[None, :] - frac[:, None]
+        h *= (gain * np.sin(np.pi * frac) / np.pi)[:, None]
+
+    # An integer delay reduces to a unit impulse at k = 0. 
+    integer = frac == 0
+    if np.any(integer):
+        h[integer] = 0
+        h[integer, Tw // 2 - 1] = gain[integer]
+
+    return h
@@ -2,23 +2,75 @@
 import libaueffect
 
 import numpy as np
+from collections import OrderedDict
 
 
 
 class RirGeneratorFromFile(object):
-    def __init__(self, rirfilelist):
+    def __init__(self, rirfilelist, truncate_db=None, sample_rate=16000, cache_size=256, preload=False):
         self._rirfiles = libaueffect.load_rir_collection(rirfilelist, filename_style='haerdoga')
+        self._truncate_db = None if truncate_db is None else libaueffect.checked_cast(truncate_db, 'float')
+        self._sample_rate = libaueffect.checked_cast(sample_rate, 'int')
+
+        # Decoded and resampled RIRs are kept in an LRU cache together with their onsets so that each file is read only once 
+        # as long as it stays in the cache. 
+        self._cache_size = libaueffect.checked_cast(cache_size, 'int')
+        self._preload = libaueffect.checked_cast(preload, 'bool')
+        self._cache = OrderedDict()
+
+        nfiles = sum(len(files) for files in self._rirfiles)
+        if self._preload:
+            self._cache_size = max(self._cache_size, nfiles)
+            for files in self._rirfiles:
+                for f in files:
+                    self._load_rir(f)
 
         print('Instantiating {}'.format(self.__class__.__name__))
         print('RIRs listed in {} are used.'.format(rirfilelist))
         print('{} rooms found.'.format(len(self._rirfiles)))
+        print('{} RIR files found.'.format(nfiles))
+        print('Sampling frequency: {}'.format(self._sample_rate))
+        print('RIR cache size: {}'.format(self._cache_size))
+        print('Preload: {}'.format(self._preload))
+        print('RIR truncation level: {} dB'.format(self._truncate_db))
         print('', flush=True)
 
 
 
-    def __call__(self, nspeakers=2, info_as_display_style=False):
-        rirfiles = self._rirfiles[np.random.randint(0, len(self._rirfiles))]  # room picked up randomly
-        h = libaueffect.load_random_rirs(rirfiles, nspeakers=nspeakers)
+    def _load_rir(self, f):
+        if f in self._cache:
+            self._cache.move_to_end(f)
+            return self._cache[f]
+
+        h = libaueffect.read_wav(f, sample_rate=self._sample_rate)[0]
+        entry = (h, libaueffect.rir_onset(h))
+
+        if self._cache_size > 0:
+            self._cache[f] = entry
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+        return entry
+
+
+
+    def __call__(self, nspeakers=2, info_as_display_style=False, remove_delay=False):
+        # Only rooms with at least nspeakers RIRs can be used. 
+        rooms = [files for files in self._rirfiles if len(files) >= nspeakers]
+        if len(rooms) == 0:
+            raise RuntimeError('No room has {} or more RIRs.'.format(nspeakers))
+
+        rirfiles = rooms[np.random.randint(0, len(rooms))]  # room picked up randomly
+        files = libaueffect.pick_random_rirs(rirfiles, nspeakers=nspeakers)
+        h, onsets = zip(*[self._load_rir(f) for f in files])
+        libaueffect.check_rir_shapes(h)
+
+        # The source geometry is unknown, so the delay is estimated from the RIRs. 
+        # The cached RIRs are copied because the mixers scale them in place. 
+        delay = min(onsets) if remove_delay else 0
+        h = [np.array(hi[:, delay:]) for hi in h]
+        if self._truncate_db is not None:
+            h = libaueffect.truncate_rirs(h, self._truncate_db)
 
         if info_as_display_style:
             info = [('rirfiles', rirfiles)]
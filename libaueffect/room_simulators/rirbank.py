@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import libaueffect
+
+import os, json
+import numpy as np
+
+from .genrir import mic_to_source_direction, is_valid_direction, speaker_location, print_room
+
+
+
+# An RIR bank consists of a flat float32 file holding the RIRs of many rooms back to back and an index file (JSON). For each 
+# room, the index stores the room dimensions, T60, mic array location, mic locations, candidate source locations and the 
+# element offset of its RIRs, which are laid out as (number of sources, number of mics, RIR length). 
+RIRBANK_INDEX = 'rirbank.json'
+RIRBANK_DATA = 'rirbank.f32'
+
+
+
+class RirBankWriter(object):
+    def __init__(self, outputdir, fs):
+        self._outputdir = os.path.abspath(outputdir)
+        self._fs = fs
+        self._rooms = []
+
+        os.makedirs(self._outputdir, exist_ok=True)
+        self._fid = open(os.path.join(self._outputdir, RIRBANK_DATA), 'wb')
+        self._offset = 0
+
+
+
+    @property
+    def indexfile(self):
+        return os.path.join(self._outputdir, RIRBANK_INDEX)
+
+
+
+    def add(self, L, rt, r, R, S, h):
+        h = np.ascontiguousarray(h, dtype='<f4')
+        nsources, nmics, rirlen = h.shape
+        if nsources != len(S):
+            raise ValueError('The number of RIRs ({}) does not match the number of source locations ({}).'.format(nsources, len(S)))
+
+        self._fid.write(memoryview(h).cast('B'))
+        self._rooms.append({'dims': [float(v) for v in L], 
+                            't60': float(rt), 
+                            'mic': [float(v) for v in r], 
+                            'mics': [[float(v) for v in m] for m in R], 
+                            'sources': [[float(v) for v in s] for s in S], 
+                            'nmics': nmics, 
+                            'rirlen': rirlen, 
+                            'offset': self._offset})
+        self._offset += h.size
+
+
+
+    def close(self):
+        if self._fid is not None:
+            self._fid.close()
+            self._fid = None
+
+        with open(self.indexfile, 'w') as f:
+            json.dump({'fs': self._fs, 'data': RIRBANK_DATA, 'rooms': self._rooms}, f)
+
+
+
+class RirBankGenerator(object):
+    '''Draw rooms and source locations from an RIR bank created with tools/gen_rirbank.py. 
+
+    The RIR data are memory-mapped, so only the RIRs actually used are read. The sources of each call are picked from the 
+    candidate locations of one room so that the angle constraints hold. 
+    '''
+    def __init__(self, rirbank, t60_range=None, min_angle_diff=30, max_angle_diff=360, max_trials=100, sound_velocity=340, truncate_db=None):
+        indexfile = os.path.join(rirbank, RIRBANK_INDEX) if os.path.isdir(rirbank) else rirbank
+        with open(indexfile) as f:
+            index = json.load(f)
+
+        self._fs = index['fs']
+        self._data = np.memmap(os.path.join(os.path.dirname(os.path.abspath(indexfile)), index['data']), dtype='<f4', mode='r')
+
+        self._t60_range = None if t60_range is None else libaueffect.checked_cast_array(t60_range, 'float', nelems=2)
+        self._min_angle_diff = libaueffect.checked_cast(min_angle_diff, 'float')
+        self._max_angle_diff = libaueffect.checked_cast(max_angle_diff, 'float')
+        self._max_trials = libaueffect.checked_cast(max_trials, 'int')
+        self._sound_velocity = libaueffect.checked_cast(sound_velocity, 'float')
+        self._truncate_db = None if truncate_db is None else libaueffect.checked_cast(truncate_db, 'float')
+
+        if self._min_angle_diff >= self._max_angle_diff:
+            raise ValueError('min_angle_diff (given: {}) must be smaller than max_angle_diff (given: {}).'.format(self._min_angle_diff, self._max_angle_diff))
+
+        self._rooms = index['rooms']
+        if self._t60_range is not None:
+            self._rooms = [room for room in self._rooms if self._t60_range[0] <= room['t60'] <= self._t60_range[1]]
+        if len(self._rooms) == 0:
+            raise RuntimeError('No room in {} satisfies the T60 range.'.format(indexfile))
+
+        # Precompute the source directions. 
+        for room in self._rooms:
+            r = np.array(room['mic'])
+            room['directions'] = [mic_to_source_direction(r, np.array(s)) for s in room['sources']]
+
+        print('Instantiating {}'.format(self.__class__.__name__))
+        print('RIR bank: {}'.format(indexfile))
+        print('Sampling frequency: {}'.format(self._fs))
+        print('{} rooms, {} source locations'.format(len(self._rooms), sum(len(room['sources']) for room in self._rooms)))
+        print('T60 range: {}'.format(self._t60_range))
+        print('Minimum angle difference between two sources: {}'.format(self._min_angle_diff))
+        print('Maximum angle difference between two sources: {}'.format(self._max_angle_diff))
+        print('RIR truncation level: {} dB'.format(self._truncate_db))
+        print('', flush=True)
+
+
+
+    def _pick_sources(self, room, nspeakers):
+        # Greedily pick sources in a random order, skipping those violating the angle constraints. 
+        picked = []
+        for i in np.random.permutation(len(room['sources'])):
+            if is_valid_direction(room['directions'][i], [room['directions'][j] for j in picked], self._min_angle_diff, self._max_angle_diff):
+                picked.append(i)
+                if len(picked) == nspeakers:
+                    return picked
+        return None
+
+
+
+    def _load_rir(self, room, i):
+        size = room['nmics'] * room['rirlen']
+        offset = room['offset'] + i * size
+        h = self._data[offset : offset + size].reshape((room['nmics'], room['rirlen']))
+        return np.array(h, dtype=libaueffect.get_float_dtype())
+
+
+
+    def __call__(self, nspeakers=2, info_as_display_style=False, remove_delay=False):
+        for trial in range(self._max_trials):
+            room = self._rooms[np.random.randint(0, len(self._rooms))]
+            picked = self._pick_sources(room, nspeakers)
+            if picked is not None:
+                break
+        else:
+            raise RuntimeError('Failed to find a room with {} valid source locations.'.format(nspeakers))
+
+        L = np.array(room['dims'])
+        rt = room['t60']
+        r = np.array(room['mic'])
+
+        h = [self._load_rir(room, i) for i in picked]
+        spkr_locations = [speaker_location(r, np.array(room['sources'][i])) for i in picked]
+
+        if remove_delay:
+            delay = libaueffect.direct_path_delay([room['sources'][i] for i in picked], room['mics'], self._sound_velocity, self._fs)
+            h = libaueffect.remove_delay_from_rirs(h, delay=delay)
+        if self._truncate_db is not None:
+            h = libaueffect.truncate_rirs(h, self._truncate_db)
+
+        # Print the simulated enviroment. 
+        print_room(L, rt, r, spkr_locations)
+
+        # return
+        if info_as_display_style:
+            info = [('t60', rt), ('angles', [l[0] for l in spkr_locations])]
+            return h, info
+        else:
+            return h, rt, spkr_locations
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import io, os, json, tarfile, time
+
+from .audio import WavStream
+from .pack import PACK_PATH_SEP
+
+
+
+# A session shard set stores the output signals of many sessions in a few large tar files. The members of a session are 
+# written back to back as '<key>.<signal>.wav' (or '<key>.<signal>.<channel>.wav' when the channels are saved separately) 
+# followed by '<key>.json' holding its mixlog entry, so that the shards can be streamed sequentially by WebDataset-style 
+# loaders. The index file (JSON) maps each session key to (shard number, byte offset, number of bytes) of its members. The 
+# key is the base name of the session's output file without its extension, and the main mixture is stored as signal 'mix'. 
+SESSION_INDEX_EXT = '.shards.json'
+
+
+
+class SessionBuffer(object):
+    '''Collect the signals of one session. 
+
+    It provides write_wav so that it can be used wherever the mixing code expects a writer. The signal name is derived from 
+    the file name that would have been written, e.g., <output>_s0.wav is stored as signal s0. 
+    '''
+    def __init__(self, output_filename):
+        self._prefix = os.path.splitext(os.path.abspath(output_filename))[0]
+        self.key = os.path.basename(self._prefix)
+        if '.' in self.key:
+            raise ValueError('Session key must not contain dots: {}'.format(self.key))
+        self._signals = []
+
+
+
+    def write_wav(self, x, path, sample_rate=16000, avoid_clipping=False, save_as_one_file=True):
+        name = os.path.splitext(os.path.abspath(path))[0]
+        if name == self._prefix:
+            name = 'mix'
+        elif name.startswith(self._prefix + '_'):
+            name = name[len(self._prefix) + 1:]
+        else:
+            name = os.path.basename(name)
+        self._signals.append((name, x, sample_rate, avoid_clipping, save_as_one_file))
+
+
+
+    def encode(self):
+        # Return the collected signals as (member name, wav stream) pairs. The signals are quantized only when the streams 
+        # are read, i.e., while they are copied into a shard. 
+        members = []
+        for name, x, sample_rate, avoid_clipping, save_as_one_file in self._signals:
+            if save_as_one_file or x.ndim == 1:
+                members.append(('{}.{}.wav'.format(self.key, name), WavStream(x, sample_rate, avoid_clipping)))
+            else:
+                for i in range(x.shape[0]):
+                    members.append(('{}.{}.{}.wav'.format(self.key, name, i), WavStream(x[i], sample_rate, avoid_clipping)))
+        self._signals = []
+        return members
+
+
+
+class SessionShardWriter(object):
+    def __init__(self, outputdir, name='sessions', shard_size=1024**3):
+        self._outputdir = os.path.abspath(outputdir)
+        self._name = name
+        self._shard_size = shard_size
+
+        self._shards = []
+        self._sessions = {}
+        self._tar = None
+
+        os.makedirs(self._outputdir, exist_ok=True)
+
+
+
+    @property
+    def indexfile(self):
+        return os.path.join(self._outputdir, self._name + SESSION_INDEX_EXT)
+
+
+
+    def path(self, key):
+        return '{}{}{}'.format(self.indexfile, PACK_PATH_SEP, key)
+
+
+
+    def _open_next_shard(self):
+        if self._tar is not None:
+            self._tar.close()
+        shard = '{}-{:05d}.tar'.format(self._name, len(self._shards))
+        self._tar = tarfile.open(os.path.join(self._outputdir, shard), 'w', format=tarfile.USTAR_FORMAT)
+        self._shards.append(shard)
+
+
+
+    def add(self, key, members, metadata):
+        '''Append the members of a session, returned by SessionBuffer.encode, and its metadata to the current shard. 
+
+        Each member is streamed into the shard, so at most one block of each signal is quantized at a time. 
+        '''
+        if key in self._sessions:
+            raise ValueError('Duplicate session key: {}'.format(key))
+
+        data = json.dumps(metadata, indent=4).encode('utf-8')
+        members = [(membername, stream.size, io.BufferedReader(stream)) for membername, stream in members]
+        members.append(('{}.json'.format(key), len(data), io.BytesIO(data)))
+        nbytes = sum(size for _, size, _ in members)
+
+        if self._tar is None or (self._tar.offset > 0 and self._tar.offset + nbytes > self._shard_size):
+            self._open_next_shard()
+
+        offset = self._tar.offset
+        mtime = time.time()
+        for membername, size, fileobj in members:
+            info = tarfile.TarInfo(membername)
+            info.size = size
+            info.mtime = mtime
+            self._tar.addfile(info, fileobj)
+        self._sessions[key] = [len(self._shards) - 1, offset, self._tar.offset - offset]
+
+        return self.path(key)
+
+
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+
+        with open(self.indexfile, 'w') as f:
+            json.dump({'shards': self._shards, 'sessions': self._sessions}, f)
+
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -7,42 +7,75 @@ import scipy.io.wavfile
 import math
 import random
 import copy
-import sys
 
 
 
-def load_random_rirs(rirfiles, nspeakers=2, sample_rate=16000):
+# Randomly pick the RIR files of nspeakers different sources. 
+def pick_random_rirs(rirfiles, nspeakers=2):
+    if len(rirfiles) < nspeakers:
+        raise RuntimeError('{} RIRs are required, but only {} are available.'.format(nspeakers, len(rirfiles)))
+
     files = copy.deepcopy(rirfiles)
     random.shuffle(files)
-    files = files[:nspeakers]
+    return files[:nspeakers]
+
+
+def load_random_rirs(rirfiles, nspeakers=2, sample_rate=16000):
+    files = pick_random_rirs(rirfiles, nspeakers=nspeakers)
     h = [libaueffect.read_wav(f, sample_rate=sample_rate)[0] for f in files]
-    if h[0].shape != h[1].shape:
-        raise RuntimeError('The RIRs have different dimensions.')
+    check_rir_shapes(h)
 
     return h
 
 
-def remove_delay_from_rirs(h):
-    delay = sys.maxsize
+def check_rir_shapes(h):
+    if any(hi.shape != h[0].shape for hi in h[1:]):
+        raise RuntimeError('The RIRs have different dimensions.')
+
 
-    for i in range(len(h)):
-        for j in range(len(h[i])):
-            h_env = np.absolute(scipy.signal.hilbert(h[i][j]))
-            if delay > np.argmax(h_env):
-                delay = np.argmax(h_env)
+# Index of the earliest peak of the Hilbert envelopes of a multi-channel RIR. 
+def rir_onset(h):
+    return min(np.argmax(np.absolute(scipy.signal.hilbert(hj))) for hj in h)
+
+
+# Remove the delay preceding the earliest arrival. 
+# Unless the delay is given, e.g., by direct_path_delay, it is estimated from the peaks of the Hilbert envelopes. 
+def remove_delay_from_rirs(h, delay=None):
+    if delay is None:
+        delay = min(rir_onset(hi) for hi in h)
     for i in range(len(h)):
         h[i] = h[i][:, delay:]
 
     return h
 
 
+# Number of samples before the earliest direct-path arrival from sources S at mics R. 
+def direct_path_delay(S, R, sound_velocity, fs):
+    S = np.atleast_2d(S)
+    R = np.atleast_2d(R)
+    dist = np.amin(np.linalg.norm(S[:, np.newaxis, :] - R[np.newaxis, :, :], axis=-1))
+    return int(np.round(dist * fs / sound_velocity))
+
+
+# Cut off the tail of each RIR where its energy decay curve, summed over the channels, falls floor_db below the total energy. 
+def truncate_rirs(h, floor_db):
+    threshold = 10**(-floor_db / 10)
+    for i in range(len(h)):
+        edc = np.cumsum(np.sum(h[i]**2, axis=0)[::-1])[::-1]
+        if edc[0] > 0:
+            h[i] = h[i][:, :max(np.count_nonzero(edc > edc[0] * threshold), 1)]
+
+    return h
+
+
 def reverb_mix(x, rirfiles, sample_rate=16000, cancel_delay=False, second_arg_is_filename=True):
     if second_arg_is_filename:
         h = load_random_rirs(rirfiles, nspeakers=2, sample_rate=sample_rate)
     else:
         h = rirfiles
 
-    nchans = h[0].shape[0]
+    h = [libaueffect.as_float(hi) for hi in h]
+    x = libaueffect.as_float(x)
         
     # Compensate for the delay.
     if cancel_delay:
@@ -52,7 +85,7 @@ def reverb_mix(x, rirfiles, sample_rate=16000, cancel_delay=False, second_arg_is
     nsrcs = x.shape[0]
     y = []
     for i in range(nsrcs):
-        y.append(np.stack([scipy.signal.lfilter(h[i][j], 1, x[i]) for j in range(nchans)]))
+        y.append(libaueffect.fir_filter(h[i], x[i]))
     y = np.stack(y)
 
     # Mix the signals together. 
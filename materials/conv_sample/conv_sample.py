@@ -61,7 +61,8 @@ h, _ = read_wav(rir_file)
 n, _ = read_wav(noise_file)
 y, _ = read_wav(noisy_file)
 
-x = scipy.signal.lfilter(h, 1, s) + n
+# FFT convolution truncated to the source length, which is equivalent to but much faster than scipy.signal.lfilter(h, 1, s). 
+x = scipy.signal.oaconvolve(h, s)[:len(s)] + n
 
 snr = 10 * np.log10( np.sum(y**2) / np.sum((x - y)**2) )
 
@@ -59,7 +59,8 @@ x = []
 for source_file, rir_file in zip(source_files, rir_files):
     s, _ = read_wav(source_file)
     h, _ = read_wav(rir_file)
-    x.append(scipy.signal.lfilter(h, 1, s))
+    # FFT convolution truncated to the source length, which is equivalent to but much faster than scipy.signal.lfilter(h, 1, s). 
+    x.append(scipy.signal.oaconvolve(h, s)[:len(s)])
 x = np.sum(np.stack(x), axis=0)
 
 n, _ = read_wav(noise_file)
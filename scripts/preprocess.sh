@@ -13,12 +13,13 @@ function print_usage_and_exit {
     echo "    ''"
     echo "    < $CMD >"
     echo ""
-    echo "    Usage: $CMD [--split N] [--help]"
+    echo "    Usage: $CMD [--split N] [--flac] [--help]"
     echo ""
     echo "    Description: Preprocess the original LibriSpeech data."
     echo ""
     echo "    Options: "
     echo "        --split N: Split the data set into N subsets for parallel processing. N defaults to 16."
+    echo "        --flac: Use the FLAC files in place instead of converting them to WAV."
     echo "        --help: Show this message."
     echo "    ''"
     echo ""
@@ -41,6 +42,9 @@ do
         shift
         nj=$1
         shift
+    elif [ "$1" == --flac ]; then
+        flac=
+        shift
     else
         echo ""
         echo "ERROR: Invalid option $1."
@@ -95,19 +99,24 @@ do
     splitdir=$dstdir/filelist/split${nj}
     mkdir -p ${splitdir}/log
 
-    # Convert FLAC files to WAV.
     if [ "$set" == train ]; then
-        python $deflac --srcdir $srcdir/train-clean-100 $srcdir/train-clean-360 $srcdir/train-other-500 --dstdir $dstdir/wav
+        subsets="train-clean-100 train-clean-360 train-other-500"
     else
-        python $deflac --srcdir $srcdir/${set}-clean --dstdir $dstdir/wav
+        subsets="${set}-clean"
     fi
 
-    # List the original wav files.
-    if [ "$set" == train ]; then
-        python $gen_filelist --srcdir $dstdir/wav/train-clean-100 $dstdir/wav/train-clean-360 $dstdir/wav/train-other-500 --outlist $dstdir/filelist/${set}.list
+    # Convert FLAC files to WAV, or link the FLAC directories, which libaueffect can read directly.
+    if [ -v flac ]; then
+        mkdir -p $dstdir/wav
+        for subset in $subsets; do
+            ln -sfn $srcdir/$subset $dstdir/wav/$subset
+        done
     else
-        python $gen_filelist --srcdir $dstdir/wav/${set}-clean --outlist $dstdir/filelist/${set}.list
-    fi        
+        python $deflac --srcdir $(for subset in $subsets; do echo $srcdir/$subset; done) --dstdir $dstdir/wav
+    fi
+
+    # List the original audio files.
+    python $gen_filelist --srcdir $(for subset in $subsets; do echo $dstdir/wav/$subset; done) --outlist $dstdir/filelist/${set}.list
 
     # Split trainlist for parallel processing
     split_scp.pl ${dstdir}/filelist/${set}.list $(for j in $(seq ${nj}); do echo ${splitdir}/${set}.${j}.list; done)
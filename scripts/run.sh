@@ -145,9 +145,10 @@ if [ ! -v cfgfile ]; then
     cfgfile=$ROOTDIR/configs/common/2mix_reverb_stanoise.json
 fi
 
-# List the source files. 
+# List the source files and fill in the header index of this set in a single serial pass. 
 datalist=$tgtroot/${set}.list
-python $gen_filelist --srcdir $srcdir --outlist $datalist
+hdrindex=$EXPROOT/data/${set}/headers.db
+python $gen_filelist --srcdir $srcdir --outlist $datalist --header_index $hdrindex --nj $nj
 
 # Subsample the files. 
 if [ -v subsample ]; then
@@ -159,14 +160,15 @@ splitdir=${tgtroot}/split${nj}
 mkdir -p ${splitdir}/log
 split_scp.pl ${datalist} $(for j in $(seq ${nj}); do echo ${splitdir}/${set}.${j}.list; done)
 
-# Create a JSON file for the source data set. (~10 min with nj=32)
+# Create a JSON file for the source data set. The headers are looked up in $hdrindex, which the parallel jobs only read 
+# because sqlite locking cannot be relied on over NFS.
 datajson=$tgtroot/${set}.json
 if [ -v vad ]; then
     ${gen_cmd} JOB=1:${nj} ${splitdir}/log/list2json.JOB.log \
-        python $list2json --input_list ${splitdir}/${set}.JOB.list --output_file ${splitdir}/${set}.JOB.json
+        python $list2json --input_list ${splitdir}/${set}.JOB.list --header_index $hdrindex --readonly_index --output_file ${splitdir}/${set}.JOB.json
 else
     ${gen_cmd} JOB=1:${nj} ${splitdir}/log/list2json.JOB.log \
-        python $list2json --input_list ${splitdir}/${set}.JOB.list --novad --output_file ${splitdir}/${set}.JOB.json
+        python $list2json --input_list ${splitdir}/${set}.JOB.list --header_index $hdrindex --readonly_index --novad --output_file ${splitdir}/${set}.JOB.json
 fi
 
 python $mergejson $(for j in $(seq ${nj}); do echo ${splitdir}/${set}.${j}.json; done) > $datajson
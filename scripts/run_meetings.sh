@@ -13,7 +13,7 @@ function print_usage_and_exit {
     echo "    ''"
     echo "    < $CMD >"
     echo ""
-    echo "    Usage: $CMD [--split N] [--roomcfg FILE] [--dyncfg FILE] [--vad] [--save_image] [--save_channels_separately] [--help] dest-dir set"
+    echo "    Usage: $CMD [--split N] [--roomcfg FILE] [--dyncfg FILE] [--vad] [--pack] [--save_image] [--save_channels_separately] [--help] dest-dir set"
     echo ""
     echo "    Description: Preprocess the original LibriSpeech data."
     echo ""
@@ -26,6 +26,7 @@ function print_usage_and_exit {
     echo "        --roomcfg FILE             : Room acoustics configuration file. FILE defaults to <repo-root>/configs/common/meeting_reverb.json."
     echo "        --dyncfg FILE              : Room acoustics configuration file. FILE defaults to <repo-root>/configs/common/meeting_dynamics.json."
     echo "        --vad                      : Use VAD-segmented signals. Not recommended."
+    echo "        --pack                     : Pack the source utterances into a few large shard files and read them from there."
     echo "        --save_image               : Save source images instead of anechoic signals and RIRs."
     echo "        --save_channels_separately : Save each output channel separately."
     echo "        --help                     : Show this message."
@@ -66,6 +67,9 @@ do
     elif [ "$1" == --vad ]; then
         vad=
         shift
+    elif [ "$1" == --pack ]; then
+        pack=
+        shift
     elif [ "$1" == --save_channels_separately ]; then
         save_channels_separately=
         shift
@@ -112,6 +116,7 @@ splitjson=$ROOTDIR/tools/splitjson.py
 mergejson=$ROOTDIR/tools/mergejsons.py
 gen_filelist=$ROOTDIR/tools/gen_filelist.py
 list2json=$ROOTDIR/tools/list2json_librispeech.py
+packcorpus=$ROOTDIR/tools/pack_corpus.py
 mixspec=$ROOTDIR/tools/gen_mixspec_mtg.py
 mixer=$ROOTDIR/tools/mixaudio_mtg.py
 
@@ -131,27 +136,41 @@ if [ ! -v dyncfg ]; then
     dyncfg=$ROOTDIR/configs/common/meeting_dynamics.json
 fi
 
-# List the source files. 
+# List the source files and fill in the header index of this set in a single serial pass. 
 datalist=$tgtroot/${set}.list
-python $gen_filelist --srcdir $srcdir --outlist $datalist
+hdrindex=$EXPROOT/data/${set}/headers.db
+python $gen_filelist --srcdir $srcdir --outlist $datalist --header_index $hdrindex --nj $nj
 
 # Split datalist for parallel processing
 splitdir=${tgtroot}/split${nj}
 mkdir -p ${splitdir}/log
 split_scp.pl ${datalist} $(for j in $(seq ${nj}); do echo ${splitdir}/${set}.${j}.list; done)
 
-# Create a JSON file for the source data set. (~10 min with nj=32)
+# Create a JSON file for the source data set. The headers are looked up in $hdrindex, which the parallel jobs only read 
+# because sqlite locking cannot be relied on over NFS.
 datajson=$tgtroot/${set}.json
 if [ -v vad ]; then
     ${gen_cmd} JOB=1:${nj} ${splitdir}/log/list2json.JOB.log \
-        python $list2json --input_list ${splitdir}/${set}.JOB.list --output_file ${splitdir}/${set}.JOB.json
+        python $list2json --input_list ${splitdir}/${set}.JOB.list --header_index $hdrindex --readonly_index --output_file ${splitdir}/${set}.JOB.json
 else
     ${gen_cmd} JOB=1:${nj} ${splitdir}/log/list2json.JOB.log \
-        python $list2json --input_list ${splitdir}/${set}.JOB.list --novad --output_file ${splitdir}/${set}.JOB.json
+        python $list2json --input_list ${splitdir}/${set}.JOB.list --header_index $hdrindex --readonly_index --novad --output_file ${splitdir}/${set}.JOB.json
 fi
 
 python $mergejson $(for j in $(seq ${nj}); do echo ${splitdir}/${set}.${j}.json; done) > $datajson
 
+# Pack the source utterances once per source directory and refer to the packed copies. The list the pack was built from 
+# is kept next to it, and the pack is rebuilt whenever the current list differs. $datajson is rewritten on every run, 
+# so its timestamp cannot tell. 
+if [ -v pack ]; then
+    packdir=${srcdir}_packed
+    if [ ! -f $packdir/${set}.json ] || ! cmp -s $datajson $packdir/${set}.src.json; then
+        python $packcorpus --inputfile $datajson --outputdir $packdir --name ${set} --outputfile $packdir/${set}.json
+        cp $datajson $packdir/${set}.src.json
+    fi
+    datajson=$packdir/${set}.json
+fi
+
 # Generate mixture specs. 
 tgtdir=$tgtroot/wav
 specjson=$tgtroot/mixspec.json
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import os, sys
+import numpy as np
+import pytest
+
+# Add path to libaueffect and load the module.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from libaueffect.room_simulators.ism import image_source_rirs
+
+pyrirgen = pytest.importorskip('pyrirgen')
+
+
+
+# Maximum absolute error relative to the peak of the pyrirgen RIRs, as in tools/bench_rirgen.py.
+TOLERANCE = 1e-6
+
+# room dimensions, source position, mic positions, T60, RIR length and whether the high-pass filter is applied
+CASES = [([4.0, 5.0, 3.0], [1.0, 2.0, 1.5], [[2.0, 2.5, 1.2], [2.1, 2.5, 1.2]], 0.3, 4096, True),
+         ([6.3, 4.7, 2.8], [4.9, 1.3, 1.7], [[3.0, 2.4, 1.0], [3.04, 2.4, 1.0], [3.0, 2.44, 1.0]], 0.6, 8192, True),
+         ([3.2, 3.9, 2.5], [0.5, 3.1, 1.1], [[1.6, 1.9, 1.3]], 0.2, 2048, False),
+         ([5.0, 5.0, 3.0], [2.0, 2.0, 1.5], [[2.5, 2.5, 1.5]], 0.0, 1024, True)]
+
+
+
+@pytest.mark.parametrize('L, s, R, rt, nsamples, hp_filter', CASES)
+def test_image_source_rirs_match_pyrirgen(L, s, R, rt, nsamples, hp_filter):
+    ref = np.array(pyrirgen.generateRir(L, s, R, soundVelocity=340, fs=16000, reverbTime=rt, nSamples=nsamples,
+                                        isHighPassFilter=hp_filter))
+    h = image_source_rirs(L, [s], R, sound_velocity=340, fs=16000, reverb_time=rt, nsamples=nsamples, hp_filter=hp_filter)[0]
+
+    assert h.shape == ref.shape
+    assert np.max(np.abs(h - ref)) <= TOLERANCE * np.max(np.abs(ref))
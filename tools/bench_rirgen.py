@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse, os, sys, time
+import numpy as np
+
+# Add path to libaueffect and load the module.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import libaueffect
+
+
+
+# RIR engines to compare. Each entry gives the room simulator class, the options added to those of the config file and 
+# whether the engine is supposed to reproduce the reference exactly. Statistical engines are evaluated by their energy 
+# decay curves instead. 
+ENGINES = {'pyrirgen': ('libaueffect.room_simulators.RandomRirGenerator', {'engine': 'pyrirgen'}, True), 
+           'numpy': ('libaueffect.room_simulators.RandomRirGenerator', {'engine': 'numpy'}, True), 
+           'hybrid': ('libaueffect.room_simulators.HybridRirGenerator', {}, False)}
+
+
+
+def create_engine(name, opts):
+    classname, engine_opts, exact = ENGINES[name]
+    opts = dict(opts, num_workers=1, **engine_opts)
+    return libaueffect.load_class(classname)(**opts)
+
+
+
+def energy_decay_curve(h):
+    # Schroeder backward integration averaged over the sources and mics, in dB. 
+    e = np.mean(np.cumsum(h[..., ::-1]**2, axis=-1)[..., ::-1], axis=(0, 1))
+    return 10 * np.log10(np.maximum(e / e[0], 1e-30))
+
+
+
+def main(args):
+    np.random.seed(args.random_seed)
+
+    opts = libaueffect.find_generator(args.configfile, 'RandomRirGenerator', args.generator_id)['opts']
+
+    # Instantiate the engines, skipping those that are not available. 
+    engines = {}
+    for name in args.engines:
+        try:
+            engines[name] = create_engine(name, opts)
+        except (ImportError, RuntimeError) as e:
+            print('Engine {} skipped: {}'.format(name, e))
+    if args.reference not in engines:
+        print('Reference engine {} is not available. Only the computation time is measured and the accuracy check fails.'.format(args.reference))
+
+    # Sample the rooms with the same parameter ranges. 
+    sampler = libaueffect.room_simulators.RandomRirGenerator(**dict(opts, engine='numpy'))
+    rooms = [sampler.sample_room_positions(args.nsources) for i in range(args.nrooms)]
+
+    times = {name: [] for name in engines}
+    errors = {name: [] for name in engines if name != args.reference and args.reference in engines}
+    edc_errors = {name: [] for name in errors}
+    print('{:>28s} {:>8s} {:>6s}'.format('room dimensions [m]', 'V [m3]', 'T60') 
+          + ''.join(' {:>10s}'.format(name + ' [s]') for name in engines) 
+          + ''.join(' {:>12s} {:>12s}'.format(name + ' err', name + ' EDC[dB]') for name in errors))
+    for L, rt, r, R, S in rooms:
+        h = {}
+        for name, engine in engines.items():
+            start = time.perf_counter()
+            h[name] = np.stack(engine.compute_rirs(L, S, R, rt))
+            times[name].append(time.perf_counter() - start)
+
+        # maximum absolute error relative to the peak of the reference RIRs
+        line = '{:>28s} {:8.1f} {:6.3f}'.format('[{:5.2f}, {:5.2f}, {:5.2f}]'.format(*L), np.prod(L), rt)
+        line += ''.join(' {:10.3f}'.format(times[name][-1]) for name in engines)
+        # and maximum deviation of the energy decay curves down to -30 dB
+        for name in errors:
+            errors[name].append(np.max(np.abs(h[name] - h[args.reference])) / np.max(np.abs(h[args.reference])))
+            edc_ref = energy_decay_curve(h[args.reference])
+            edc_errors[name].append(np.max(np.abs(energy_decay_curve(h[name]) - edc_ref)[edc_ref > -30]))
+            line += ' {:12.3e} {:12.2f}'.format(errors[name][-1], edc_errors[name][-1])
+        print(line, flush=True)
+
+    # Print the summary. 
+    print('')
+    for name in engines:
+        print('{}: {:.3f} s per room ({} sources)'.format(name, np.mean(times[name]), args.nsources))
+
+    ok = args.reference in engines
+    for name, err in errors.items():
+        if ENGINES[name][2]:
+            print('{}: max relative error {:.3e} (tolerance {:.1e})'.format(name, max(err), args.tolerance))
+            ok = ok and max(err) <= args.tolerance
+        else:
+            print('{}: max EDC deviation {:.2f} dB, {:.1f} times faster than {}'.format(name, max(edc_errors[name]), np.sum(times[args.reference]) / np.sum(times[name]), args.reference))
+
+    return 0 if ok else 1
+
+
+
+def make_argparse():
+    # Set up an argument parser. 
+    parser = argparse.ArgumentParser(description='Compare the speed and accuracy of the RIR engines on rooms drawn from a mixer config. The exit status is nonzero if the reference engine is not available or an engine deviates from it beyond the tolerance.')
+    parser.add_argument('--configfile', required=True, 
+                        help='Mixer config file whose room simulator defines the parameter ranges.')
+    parser.add_argument('--generator_id', 
+                        help='ID of the room simulator in the config file. The first RandomRirGenerator is used by default.')
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES), 
+                        help='Engines to compare. (default={})'.format(' '.join(ENGINES)))
+    parser.add_argument('--reference', choices=list(ENGINES), default='pyrirgen', 
+                        help='Engine against which the others are compared. (default=pyrirgen)')
+    parser.add_argument('--tolerance', type=float, default=1e-6, 
+                        help='Maximum error relative to the peak of the reference RIRs. This applies to the exact engines only. (default=1e-6)')
+    parser.add_argument('--nrooms', type=int, default=10, 
+                        help='Number of rooms. (default=10)')
+    parser.add_argument('--nsources', type=int, default=4, 
+                        help='Number of sources per room. (default=4)')
+    parser.add_argument('--random_seed', type=int, default=0, 
+                        help='Seed for the random number generator. (default=0)')
+                        
+    return parser
+    
+    
+if __name__ == '__main__':
+    parser = make_argparse()
+    args = parser.parse_args()
+    sys.exit(main(args))
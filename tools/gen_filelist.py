@@ -2,7 +2,10 @@
 # -*- coding: utf-8 -*-
 import argparse, os, sys
 import fnmatch
-import wave
+
+# Add path to libaueffect and load the module.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import libaueffect
 
 
 
@@ -10,8 +13,7 @@ def write_one_file(ostream, src, min_samplerate=None):
     ok_to_write = True
 
     if min_samplerate is not None:
-        with wave.open(src) as wf:
-            fs = wf.getframerate()
+        _, _, fs, _ = libaueffect.read_wavheader(src)
         if fs < min_samplerate:
             ok_to_write = False
 
@@ -30,14 +32,25 @@ def main(args):
     tgtdir = os.path.dirname(os.path.abspath(args.outlist))
     os.makedirs(tgtdir, exist_ok=True)
 
+    # List the files of interest. 
+    files = []
+    for srcdir in args.srcdir:
+        for dirpath, dirnames, filenames in os.walk(srcdir, followlinks=True):
+            for filename in filenames:
+                include_test = any([fnmatch.fnmatch(filename, f) for f in args.include_filter])
+                exclude_test = all([not fnmatch.fnmatch(filename, f) for f in args.exclude_filter])
+                if include_test and exclude_test:
+                    files.append(os.path.join(dirpath, filename))
+
+    # Fill in the header index so that the later stages can look up the headers. 
+    if args.header_index is not None:
+        index = libaueffect.set_header_index(args.header_index)
+        nread = index.update(files, nj=args.nj)
+        print('{} of {} headers read into {}.'.format(nread, len(files), args.header_index), flush=True)
+
     with open(args.outlist, 'w') as ostream:
-        for srcdir in args.srcdir:
-            for dirpath, dirnames, filenames in os.walk(srcdir):
-                for filename in filenames:
-                    include_test = any([fnmatch.fnmatch(filename, f) for f in args.include_filter])
-                    exclude_test = all([not fnmatch.fnmatch(filename, f) for f in args.exclude_filter])
-                    if include_test and exclude_test:
-                        write_one_file(ostream, os.path.join(dirpath, filename), args.min_samplerate)
+        for f in files:
+            write_one_file(ostream, f, args.min_samplerate)
 
 
     
@@ -48,12 +61,16 @@ def make_argparse():
                         help='Source directory. All files under this directory will be listed.')
     parser.add_argument('--outlist', metavar='<dir>', required=True,
                         help='Name of the output file listing the filenames of interest.')
-    parser.add_argument('--include_filter', nargs='*', metavar='<pattern str>', default=['*.wav', '*.WAV'],
-                        help='File names that match one of these are included in the list. By default, only files with .wav or .WAV extensions are included.')
+    parser.add_argument('--include_filter', nargs='*', metavar='<pattern str>', default=['*.wav', '*.WAV', '*.flac'],
+                        help='File names that match one of these are included in the list. By default, only files with .wav, .WAV or .flac extensions are included.')
     parser.add_argument('--exclude_filter', nargs='*', metavar='<pattern str>', default=[], 
                         help='File names that match one of these are not included in the list. This is not used by default.')
     parser.add_argument('--min_samplerate', metavar='<int>', type=int,
-                        help='Minimum sampling rate in Hz. Caution: Make sure that the target files are wav files. This program performs no format check.')
+                        help='Minimum sampling rate in Hz. Caution: Make sure that the target files are audio files readable by libaueffect. This program performs no format check.')
+    parser.add_argument('--header_index', metavar='<file>', 
+                        help='Persistent header index (sqlite3 database) to be filled with the headers of the listed files.')
+    parser.add_argument('--nj', metavar='<int>', type=int, default=8, 
+                        help='Number of threads used for reading the headers. (default=8)')
                         
     return parser
     
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse, os, sys
+import numpy as np
+
+# Add path to libaueffect and load the module.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import libaueffect
+
+
+
+def main(args):
+    # Make the results predictable.
+    if args.random_seed is not None:
+        np.random.seed(args.random_seed)
+
+    generator_info = libaueffect.find_generator(args.configfile, 'NoiseGenerator', args.generator_id)
+    noise_generator = libaueffect.load_class(generator_info['generator'])(**generator_info['opts'])
+
+    fs = generator_info['opts'].get('fs', 16000)
+    nsamples = int(args.length * fs)
+
+    if nsamples < max(args.crossfade, 1):
+        raise ValueError('The noise bank must be at least as long as the crossfade ({} samples): --length {}'.format(args.crossfade, args.length))
+
+    # Extra samples are generated to make the bank circular. 
+    total = nsamples + args.crossfade
+
+    writer = None
+    t = 0
+    if hasattr(noise_generator, 'generate_blocks'):
+        blocks = noise_generator.generate_blocks(total, args.block_size)
+    else:
+        blocks = [noise_generator(nsamples=total)]
+
+    for n in blocks:
+        if writer is None:
+            writer = libaueffect.noise_generators.NoiseBankWriter(args.outputdir, fs=fs, nchannels=n.shape[0], 
+                                                                  crossfade=args.crossfade, info=generator_info)
+        writer.write(n)
+        t += n.shape[1]
+
+        # Print a progress report. 
+        print('{:.2f}% [{}/{}]'.format(t / total * 100, t, total), flush=True)
+
+    writer.close()
+    print('Index file: {}'.format(writer.indexfile))
+
+
+
+def make_argparse():
+    # Set up an argument parser. 
+    parser = argparse.ArgumentParser(description='Precompute a bank of multi-channel noise for NoiseBankGenerator.')
+    parser.add_argument('--configfile', required=True, 
+                        help='Mixer config file whose noise generator defines the array geometry and spectral shape.')
+    parser.add_argument('--generator_id', 
+                        help='ID of the noise generator in the config file. The first noise generator is used by default.')
+    parser.add_argument('--outputdir', required=True,
+                        help='Directory where the noise data and index files are stored.')
+    parser.add_argument('--length', type=float, default=600, 
+                        help='Length of the noise bank in seconds. (default=600)')
+    parser.add_argument('--block_size', type=int, default=160000, 
+                        help='Number of samples generated at a time. (default=160000)')
+    parser.add_argument('--crossfade', type=int, default=4096, 
+                        help='Number of samples cross-faded to join the end of the bank to its beginning. (default=4096)')
+    parser.add_argument('--random_seed', type=int, 
+                        help='Seed for the random number generator.')
+                        
+    return parser
+    
+    
+if __name__ == '__main__':
+    parser = make_argparse()
+    args = parser.parse_args()
+    main(args)
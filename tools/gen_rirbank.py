@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse, os, sys
+import multiprocessing as mp
+import numpy as np
+
+# Add path to libaueffect and load the module.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import libaueffect
+
+
+
+# The room simulator used in each worker process. 
+_room_simulator = None
+
+
+
+def init_worker(generator_info):
+    global _room_simulator
+    # Each room is computed serially in one worker. 
+    opts = dict(generator_info['opts'], num_workers=1)
+    _room_simulator = libaueffect.load_class(generator_info['generator'])(**opts)
+
+
+
+def compute_room(room):
+    L, rt, r, R, S, seed = room
+
+    # Forked workers start from the same random state, so each room is computed with its own seed. 
+    np.random.seed(seed)
+    h = np.stack(_room_simulator.compute_rirs(L, S, R, rt))
+    return L, rt, r, R, S, h
+
+
+
+def main(args):
+    # Make the results predictable.
+    if args.random_seed is not None:
+        np.random.seed(args.random_seed)
+
+    generator_info = libaueffect.find_generator(args.configfile, 'RandomRirGenerator', args.generator_id)
+    init_worker(generator_info)
+
+    # Sample the room geometries in this process so that the bank only depends on the random seed. 
+    rooms = [_room_simulator.sample_room_positions(args.npositions) for i in range(args.nrooms)]
+    seeds = np.random.randint(0, 2**31, size=len(rooms))
+    rooms = [room + (seed,) for room, seed in zip(rooms, seeds)]
+
+    writer = libaueffect.room_simulators.RirBankWriter(args.outputdir, fs=generator_info['opts'].get('fs', 16000))
+
+    # Compute the RIRs of each room in parallel. 
+    with mp.Pool(args.nj, initializer=init_worker, initargs=(generator_info,)) as pool:
+        for i, (L, rt, r, R, S, h) in enumerate(pool.imap(compute_room, rooms)):
+            writer.add(L, rt, r, R, S, h)
+
+            # Print a progress report. 
+            if (i + 1) % 10 == 0:
+                print('{:.2f}% [{}/{}]'.format((i + 1) / len(rooms) * 100, i + 1, len(rooms)), flush=True)
+
+    writer.close()
+    print('Index file: {}'.format(writer.indexfile))
+
+
+
+def make_argparse():
+    # Set up an argument parser. 
+    parser = argparse.ArgumentParser(description='Precompute a bank of RIRs for RirBankGenerator.')
+    parser.add_argument('--configfile', required=True, 
+                        help='Mixer config file whose room simulator defines the parameter ranges.')
+    parser.add_argument('--generator_id', 
+                        help='ID of the room simulator in the config file. The first RandomRirGenerator is used by default.')
+    parser.add_argument('--outputdir', required=True,
+                        help='Directory where the RIR data and index files are stored.')
+    parser.add_argument('--nrooms', type=int, default=1000, 
+                        help='Number of rooms. (default=1000)')
+    parser.add_argument('--npositions', type=int, default=32, 
+                        help='Number of source locations per room. (default=32)')
+    parser.add_argument('--nj', type=int, default=os.cpu_count(), 
+                        help='Number of worker processes. (default=number of CPUs)')
+    parser.add_argument('--random_seed', type=int, 
+                        help='Seed for the random number generator.')
+                        
+    return parser
+    
+    
+if __name__ == '__main__':
+    parser = make_argparse()
+    args = parser.parse_args()
+    main(args)
@@ -1,8 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import argparse, os, sys, re, json, wave
+import argparse, os, sys, re, json
 from collections import OrderedDict
 
+# Add path to libaueffect and load the module.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import libaueffect
+
 
 
 def main(args):
@@ -15,10 +19,20 @@ def main(args):
         for l in input_strm:
             nlines += 1
 
+    # Look up the headers in the persistent index, reading only the missing ones. 
+    if args.header_index is not None and args.readonly_index:
+        libaueffect.set_header_index(args.header_index, readonly=True)
+    elif args.header_index is not None:
+        with open(args.input_list) as input_strm:
+            paths = [l.rstrip() for l in input_strm]
+        index = libaueffect.set_header_index(args.header_index)
+        nread = index.update(paths, nj=args.nj)
+        print('{} of {} headers read into {}.'.format(nread, len(paths), args.header_index), flush=True)
+
     if args.novad:
-        spkr_ptrn = re.compile('(\d+)-\d+-\d+\.wav')
+        spkr_ptrn = re.compile('(\d+)-\d+-\d+\.(?:wav|flac)')
     else:
-        spkr_ptrn = re.compile('(\d+)-\d+-\d+_\d\.wav')
+        spkr_ptrn = re.compile('(\d+)-\d+-\d+_\d\.(?:wav|flac)')
 
     # 103-1240-0000_1
 
@@ -38,10 +52,8 @@ def main(args):
 
             spkrid = m.group(1) 
 
-            with wave.open(path) as wf:
-                nsamples = wf.getnframes()
-                sr = wf.getframerate()
-                dur = nsamples / sr
+            nsamples, _, sr, _ = libaueffect.read_wavheader(path)
+            dur = nsamples / sr
                 
             # Generate segment info for the current file. 
             seg_info = OrderedDict([('utterance_id', uttid),
@@ -69,11 +81,17 @@ def make_argparse():
     # Set up an argument parser. 
     parser = argparse.ArgumentParser(description='Create a JSON file for LibriSpeech.')
     parser.add_argument('--input_list', required=True, 
-                        help='Wav file list.')
+                        help='Audio file list. Both WAV and FLAC files are accepted.')
     parser.add_argument('--output_file', required=True,
                         help='Output JSON file name.')
     parser.add_argument('--novad', action='store_true', 
                         help='File name pattern for the no-VAD (i.e., the original LibriSpeech) data.')
+    parser.add_argument('--header_index', 
+                        help='Persistent header index (sqlite3 database) shared with gen_filelist.py.')
+    parser.add_argument('--readonly_index', action='store_true', 
+                        help='Only read the header index, without locking it. Use this when parallel jobs share an index filled beforehand by gen_filelist.py.')
+    parser.add_argument('--nj', type=int, default=8, 
+                        help='Number of threads used for reading the headers missing from the index. (default=8)')
                         
     return parser
     
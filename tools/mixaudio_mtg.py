@@ -10,12 +10,35 @@ import libaueffect
 
 
 
+def load_inputs(iofiles, sample_rate, cancel_dcoffset):
+    # Load each input signal.
+    x = []
+    for f in iofiles['inputs']:
+        f = os.path.abspath(f['path'])
+        try:
+            _x, sr = libaueffect.read_wav(f, sample_rate=sample_rate, channel=0)
+        except RuntimeError:
+            print('Wav file is broken, skipped: {}'.format(f))
+            continue
+
+        if cancel_dcoffset:
+            _x -= np.mean(_x)
+        x.append(_x)
+
+    return x
+
+
+
 def main(args):
     # Make the results predictable.
     if args.random_seed is not None:
         random.seed(args.random_seed)
         np.random.seed(args.random_seed)
 
+    # Cache resampled sources and RIRs on disk if requested. 
+    if args.resample_cachedir is not None:
+        libaueffect.set_resample_cache(args.resample_cachedir)
+
     # Read in the IO list. 
     with open(args.iolist) as f:
         iolist = json.load(f)
@@ -24,6 +47,10 @@ def main(args):
     mixers, priors = mixer_array = libaueffect.create_AudioMixerArray(args.mixers_configfile) 
     nmixers = len(mixers)
 
+    # Override the floating-point precision of the config file if requested. 
+    if args.precision is not None:
+        libaueffect.set_float_dtype(args.precision)
+
     # Create the output directories.
     os.makedirs(os.path.dirname(os.path.abspath(args.outlist)), exist_ok=True)
     os.makedirs(os.path.dirname(os.path.abspath(args.log)), exist_ok=True)
@@ -33,12 +60,48 @@ def main(args):
     else:
         to_return = ('source', 'rir', 'noise')
 
+    # Load the input signals of the upcoming sessions in the background. 
+    inputs = libaueffect.prefetch(lambda iofiles: load_inputs(iofiles, args.sample_rate, args.cancel_dcoffset), 
+                                  iolist, 
+                                  nworkers=args.io_workers, 
+                                  depth=args.prefetch)
+
+    # Pack the sessions into shard files instead of writing separate wav files if requested. 
+    shards = None
+    if args.output_backend == 'shards':
+        shard_dir = args.shard_dir
+        if shard_dir is None:
+            shard_dir = os.path.join(os.path.dirname(os.path.abspath(args.outlist)), 'shards')
+        shards = libaueffect.SessionShardWriter(shard_dir, shard_size=args.shard_size * 1024**2)
+
+    # The sessions are streamed into the shards on the writer threads. Each one waits for the previous one so that the 
+    # shards keep the order of the list. 
+    def add_to_shards(previous, key, members, params):
+        if previous is not None:
+            previous.result()
+        shards.add(key, members, params)
+    last_added = None
+
+    # Write the output files in the background. 
+    # The list and log entries of each session are written in order once all of its files have been written. 
+    writer = libaueffect.AsyncWriter(nworkers=args.write_workers, max_pending=args.max_pending_writes)
+
+    def write_entries(outfile, params, last):
+        print(outfile, file=outfile_stream)
+        json.dump(params, log_stream, indent=4)
+
+        # Print the list element separator. 
+        if last:
+            print('', file=log_stream)
+        else:
+            print(',', file=log_stream)
+
     with open(args.log, 'w') as log_stream:
         print('[', file=log_stream)
 
-        with open(args.outlist, 'w') as outfile_stream:
+        with open(args.outlist, 'w') as outfile_stream, writer:
             # Process each audio file.
-            for i, iofiles in enumerate(iolist):
+            for i, (iofiles, x) in enumerate(zip(iolist, inputs)):
                 print('[{}/{} ({:.3f}%)]'.format(i+1, len(iolist), i / len(iolist)))
 
                 infiles = [os.path.abspath(f['path']) for f in iofiles['inputs']]
@@ -46,56 +109,47 @@ def main(args):
                 spkr_labs = [f['speaker_id'] for f in iofiles['inputs']]
                 outfile = os.path.abspath(iofiles['output'])
 
-                # Load each input signal.
-                x = []
-                for f in infiles:
-                    try:
-                        _x, sr = libaueffect.read_wav(f, sample_rate=args.sample_rate, channel=0)
-                    except RuntimeError:
-                        print('Wav file is broken, skipped: {}'.format(f))
-                        continue
-
-                    if args.cancel_dcoffset:
-                        _x -= np.mean(_x)
-                    x.append(_x)
+                # The input signals have been loaded in the background. 
                 sr = args.sample_rate
 
                 # Mix the signals. 
                 mixer = mixers[np.random.choice(nmixers, p=priors)]
                 y, p, interm = mixer(x, offsets, spkr_labs, to_return=to_return)
 
+                # Collect the signals of the session when packing them into shards. 
+                sink = writer if shards is None else libaueffect.SessionBuffer(outfile)
+
                 # Save the output signal. 
-                print(os.path.abspath(outfile), file=outfile_stream)
-                libaueffect.write_wav(y, 
-                                      outfile, 
-                                      sample_rate=sr, 
-                                      avoid_clipping=False, 
-                                      save_as_one_file=(not args.save_each_channel_in_onefile))
+                sink.write_wav(y, 
+                               outfile, 
+                               sample_rate=sr, 
+                               avoid_clipping=False, 
+                               save_as_one_file=(not args.save_each_channel_in_onefile))
 
                 # Save the intermediate signals. 
                 for dt in interm.values():
                     for key in dt:
                         filename = f"{os.path.splitext(outfile)[0]}_{key}.wav"
-                        libaueffect.write_wav(dt[key], 
-                                              filename, 
-                                              avoid_clipping=False, 
-                                              save_as_one_file=(not args.save_each_channel_in_onefile))
+                        sink.write_wav(dt[key], 
+                                       filename, 
+                                       avoid_clipping=False, 
+                                       save_as_one_file=(not args.save_each_channel_in_onefile))
 
                 input_info = [{'path': os.path.abspath(f['path']), 
                                'speaker_id': f['speaker_id'], 
                                'offset': f['offset'], 
                                'length_in_seconds': f['length_in_seconds']} for f in iofiles['inputs']]
                 params = OrderedDict([('output', outfile), ('inputs', input_info)] + list(p.items()))
-                json.dump(params, log_stream, indent=4)
-
-                # Print the list element separator. 
-                if iofiles == iolist[-1]:
-                    print('', file=log_stream)
-                else:
-                    print(',', file=log_stream)
+                if shards is not None:
+                    last_added = writer.submit(add_to_shards, last_added, sink.key, sink.encode(), params)
+                    outfile = shards.path(sink.key)
+                writer.then(write_entries, outfile, params, iofiles == iolist[-1])
 
             # end of the list. 
-            print(']', file=log_stream)
+            writer.then(print, ']', file=log_stream)
+
+        if shards is not None:
+            shards.close()
 
     return 0
 
@@ -107,7 +161,13 @@ def make_argparse():
     defaults = {'outlist' : 'tmp/audio_mixer_out.scp',
                 'log' : 'tmp/audio_mixer_run.json',
                 'ncopies' : 1,
-                'filename_style' : None}
+                'filename_style' : None, 
+                'prefetch' : 2, 
+                'io_workers' : 4, 
+                'write_workers' : 2, 
+                'max_pending_writes' : 32, 
+                'output_backend' : 'wav', 
+                'shard_size' : 1024}
 
     # Set up an argument parser.
     parser = argparse.ArgumentParser(description='Mix audio files.')
@@ -122,6 +182,12 @@ def make_argparse():
                            help='List of generated audio files. (default={})'.format(defaults['outlist']))
     dest_args.add_argument('--log', metavar='FILE', default=defaults['log'],
                            help='Log file. (default={})'.format(defaults['log']))
+    dest_args.add_argument('--output_backend', choices=['wav', 'shards'], default=defaults['output_backend'],
+                           help='How the output signals are stored. wav writes separate wav files. shards packs each session with its log entry into sequential tar shards, and the output list then refers to the sessions as SHARD_INDEX#KEY. (default={})'.format(defaults['output_backend']))
+    dest_args.add_argument('--shard_dir', metavar='DIR',
+                           help='Output directory of the shards. (default=shards next to the output list)')
+    dest_args.add_argument('--shard_size', metavar='MB', type=int, default=defaults['shard_size'],
+                           help='Approximate size of each shard in megabytes. (default={})'.format(defaults['shard_size']))
 
     proc_args = parser.add_argument_group('General processing options')
     proc_args.add_argument('--sample_rate', metavar='N', type=int,
@@ -130,6 +196,16 @@ def make_argparse():
                            help='Seed for random number generators. The current system time is used when this option is not used.')
     proc_args.add_argument('--cancel_dcoffset', action='store_true',
                            help='Unbias the DC offset.')
+    proc_args.add_argument('--resample_cachedir', metavar='DIR',
+                           help='Directory where resampled source files and RIRs are cached across runs. Caching is disabled by default.')
+    proc_args.add_argument('--prefetch', metavar='N', type=int, default=defaults['prefetch'],
+                           help='Number of upcoming sessions whose input signals are loaded in the background. 0 disables prefetching. (default={})'.format(defaults['prefetch']))
+    proc_args.add_argument('--io_workers', metavar='N', type=int, default=defaults['io_workers'],
+                           help='Number of threads used for loading the input signals. (default={})'.format(defaults['io_workers']))
+    proc_args.add_argument('--write_workers', metavar='N', type=int, default=defaults['write_workers'],
+                           help='Number of threads used for writing the output files. 0 writes them synchronously. (default={})'.format(defaults['write_workers']))
+    proc_args.add_argument('--max_pending_writes', metavar='N', type=int, default=defaults['max_pending_writes'],
+                           help='Maximum number of output files waiting to be written. (default={})'.format(defaults['max_pending_writes']))
     proc_args.add_argument('--save_each_channel_in_onefile', action='store_true', 
                            help='Save each channel in a separate file.')
     proc_args.add_argument('--save_image', action='store_true', 
@@ -138,6 +214,8 @@ def make_argparse():
     mix_args = parser.add_argument_group('Mixer options')
     mix_args.add_argument('--mixers_configfile', metavar='FILE', 
                           help='Config file for building an array of mixers.')
+    mix_args.add_argument('--precision', choices=['float32', 'float64'], 
+                          help='Floating-point precision of the mixing pipeline. This overrides the precision value of the config file. float64 is used when neither is specified.')
 
     return parser
 
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse, os, sys, json
+from collections import OrderedDict
+
+# Add path to libaueffect and load the module.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import libaueffect
+
+
+
+def main(args):
+    # Read the corpus file created by list2json_librispeech.py. 
+    with open(args.inputfile) as f:
+        corpus = json.load(f, object_pairs_hook=OrderedDict)
+
+    writer = libaueffect.PackedCorpusWriter(args.outputdir, name=args.name, shard_size=args.shard_size * 1024**2)
+
+    # Pack each utterance and point the corpus entry to the packed copy. 
+    for i, seg_info in enumerate(corpus):
+        x, sr = libaueffect.read_wav(seg_info['path'])
+        seg_info['path'] = writer.add(seg_info['utterance_id'], x, sr)
+
+        # Print a progress report. 
+        if (i + 1) % 1000 == 0:
+            print('{:.2f}% [{}/{}]'.format((i + 1) / len(corpus) * 100, i + 1, len(corpus)), flush=True)
+
+    writer.close()
+    print('Index file: {}'.format(writer.indexfile))
+
+    # Generate the output corpus file. 
+    os.makedirs(os.path.dirname(os.path.abspath(args.outputfile)), exist_ok=True)
+    with open(args.outputfile, 'w') as f:
+        json.dump(corpus, f, indent=2)
+
+
+
+def make_argparse():
+    # Set up an argument parser. 
+    parser = argparse.ArgumentParser(description='Pack the source utterances of a corpus JSON file into a few large shard files.')
+    parser.add_argument('--inputfile', required=True, 
+                        help='Input corpus JSON file created by list2json_librispeech.py.')
+    parser.add_argument('--outputdir', required=True,
+                        help='Directory where the shard files and the index file are stored.')
+    parser.add_argument('--outputfile', required=True,
+                        help='Output corpus JSON file, whose paths refer to the packed utterances.')
+    parser.add_argument('--name', default='corpus', 
+                        help='Base name of the shard and index files. (default=corpus)')
+    parser.add_argument('--shard_size', type=int, metavar='<MB>', default=2048, 
+                        help='Maximum size of each shard file in MB. (default=2048)')
+                        
+    return parser
+    
+    
+if __name__ == '__main__':
+    parser = make_argparse()
+    args = parser.parse_args()
+    main(args)
+    
@@ -4,9 +4,17 @@ import argparse, os, sys, contextlib, wave, collections
 import numpy as np
 
 import webrtcvad
+import soundfile as sf
     
 
 def read_wave(path):
+    if os.path.splitext(path)[1].lower() != '.wav':
+        info = sf.info(path)
+        assert info.channels == 1
+        assert info.samplerate in (8000, 16000, 32000)
+        pcm_data, sample_rate = sf.read(path, dtype='int16')
+        return pcm_data.tobytes(), sample_rate
+
     with contextlib.closing(wave.open(path, 'rb')) as wf:
         num_channels = wf.getnchannels()
         assert num_channels == 1